@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from rest_framework.response import Response
+
+from .base_view import OptimizationCalculationBasedPlotView
+
+
+class AsyncOptimizationCalculationBasedPlotView(OptimizationCalculationBasedPlotView):
+    """
+    OptimizationCalculationBasedPlotView served as native async view (ASGI), gives the same output
+
+    Batches of plots_configs are queried concurrently (max_workers at once) in worker threads,
+    building frames and serialization run in worker threads too, so event loop is free for other requests.
+    Only GET is supported, stream parameter is ignored, batch of calculations (batch=True) is built in worker thread.
+    """
+    max_workers = 4
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        for key in initkwargs:
+            if not hasattr(cls, key):
+                raise TypeError('{}() received an invalid keyword {!r}'.format(cls.__name__, key))
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            return await self.async_dispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.csrf_exempt = True
+        return view
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        """ APIView.dispatch with GET handler awaited """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() != 'get':
+                self.http_method_not_allowed(request, *args, **kwargs)
+            response = await self.async_get(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = await sync_to_async(self.finalize_response)(request, response, *args, **kwargs)
+        return self.response
+
+    async def async_get(self, request, *args, **kwargs):
+        if self.batch:
+            return await sync_to_async(self.get_batch)(request)
+        response = await sync_to_async(self.initial_plot_request)(request, kwargs)
+        if response is not None:
+            return response
+        response = await sync_to_async(self.get_snapshot_response)(request)
+        if response is not None:
+            return self.set_plot_headers(response)
+        pd_list = await self.async_get_queryset()
+        data = await sync_to_async(self.serialize, thread_sensitive=False)(pd_list)
+        return self.set_plot_headers(Response(data))
+
+    def serialize(self, pd_list):
+        with self.timings.stage('serialize'):
+            return self.get_serializer(pd_list, many=True).data
+
+    async def async_get_queryset(self):
+        if self.plot_cache is None:
+            return await self.async_build_pd_list()
+        key = self.get_cache_key()
+        pd_list = await sync_to_async(self.plot_cache.get)(key)
+        if pd_list is None:
+            pd_list = await self.async_build_pd_list()
+            await sync_to_async(self.plot_cache.set)(key, pd_list, self.optimization_calculation.id)
+        return pd_list
+
+    async def async_build_pd_list(self):
+        plots_configs = self.plots_configs or []
+        semaphore = asyncio.Semaphore(max(self.max_workers, 1))
+
+        async def build_batch_dfs(batch):
+            async with semaphore:
+                return await sync_to_async(self._build_batch_dfs, thread_sensitive=False)(batch)
+
+        dfs = {}
+        for batch_dfs in await asyncio.gather(*map(build_batch_dfs, self.plan_batches(plots_configs))):
+            dfs.update(batch_dfs)
+        plots_dfs = [(plot, dfs[position]) for position, plot in enumerate(plots_configs)]
+        return await sync_to_async(self._build_pd_list, thread_sensitive=False)(plots_dfs)
+
+    def _build_pd_list(self, plots_dfs):
+        """ build_pd_list in worker thread, groups of chunked plots are queried there too """
+        try:
+            return self.build_pd_list(plots_dfs)
+        finally:
+            connections.close_all()
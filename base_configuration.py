@@ -1,13 +1,56 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from datetime import timedelta
+import hashlib
+import warnings
+from collections import namedtuple
+from django.db.models import Avg, Count, DateTimeField, ExpressionWrapper, F, IntegerField, Max, Min, Sum
+from django.db.models.functions import Floor, Trunc
 from .plot_utils import read_frame
+from .loaders import CHUNKS, FETCHED_VALUE_SIZE, LOADERS, iter_frame_chunks
+from .timings import NULL_TIMINGS
+import numpy as np
 import pandas as pd
 
 
+Frequency = namedtuple('Frequency', 'trunc_kind hours date_range_freq')
+
+FREQUENCIES = {
+    'H': Frequency('hour', 1, 'H'),
+    'D': Frequency('day', 24, 'D'),
+    'W': Frequency('week', 168, 'W-MON'),
+}
+
+AGGREGATIONS = {
+    'sum': Sum,
+    'mean': Avg,
+    'min': Min,
+    'max': Max,
+    'last': None,
+}
+
+
+class PlotContext(namedtuple('PlotContext', 'optimization_calculation optimization_configuration start_time end_time '
+                                            'frequency timings', defaults=(None, NULL_TIMINGS))):
+    """
+    Request data for PlotConfig, start_time and end_time narrow time frame of optimization calculation,
+    frequency (key of FREQUENCIES) overrides resample of PlotConfig,
+    timings (timings.PlotTimings) records query and transform stages of PlotConfig
+    """
+
+    @classmethod
+    def for_calculation(cls, optimization_calculation, start_time=None, end_time=None, frequency=None):
+        """ context with optimization configuration of calculation, time frame clipped to calculation time frame """
+        start_time = max(start_time, optimization_calculation.start_time) if start_time \
+            else optimization_calculation.start_time
+        end_time = min(end_time, optimization_calculation.end_time) if end_time else optimization_calculation.end_time
+        return cls(optimization_calculation, optimization_calculation.optimization_configuration, start_time, end_time,
+                   frequency)
+
+
 class PlotConfig:
     """
   Storage for configurations with dynamic generation of DataFrame and queryset for given settings
+  and request context (PlotContext), configuration itself is not changed by requests
 
   input:
   model = model to plot with ForeignKey OptimizationConfiguration or OptimizationCalculation
@@ -16,13 +59,23 @@ class PlotConfig:
   values = model attributes for y-axis
   time_filter = time attribute name and time function used to generate time frame filter
   labels = map source_name -> user given name
+  downsample = algorithm reducing series to max_points given in request, 'lttb' or 'minmax' (see downsampling.py)
+  loader = how queryset is read into DataFrame, 'read_frame' (django_pandas) or columnar 'values_list', 'cursor'
+  resample = frequency of time buckets (key of FREQUENCIES), values are aggregated foreach bucket in database,
+  None for TIME_FREQUENCE (no aggregation)
+  aggregation = 'sum', 'mean', 'min', 'max' or 'last' (aggregated in pandas) of values in time bucket
+  chunk_memory = memory budget in bytes of rows read at once, rows are read in chunks and transformed
+  one group of first index attribute at a time (see iter_group_frames), None reads all rows at once
   """
-    optimization_configuration = None
+    optimization_configuration = None  # deprecated, see set_optimization_calc_conf
     optimization_calculation = None
 
     TIME_FREQUENCE = 'H'
+    CALCULATION_KEY = 'calculation_key'
+    TIME_BUCKET = 'time_bucket'
 
-    def __init__(self, model, filters, time_filter, index=[], values=[], labels={}, unit=''):
+    def __init__(self, model, filters, time_filter, index=[], values=[], labels={}, unit='', downsample='lttb',
+                 loader='read_frame', resample=None, aggregation='mean', chunk_memory=None):
         self._model = model
         self.filters = filters
         self.index = index
@@ -34,91 +87,360 @@ class PlotConfig:
             self.time_field = self.time_filter[:find_index] if find_index > -1 else self.time_filter
         self.labels = labels
         self.unit = unit
+        self.downsample = downsample
+        self.loader = loader
+        self.resample = resample
+        self.aggregation = aggregation
+        self.chunk_memory = chunk_memory
 
     @property
     def all_values(self):
         return self.values + self.index
 
+    @property
+    def fingerprint(self):
+        """
+        stable hash of configuration, time function is identified by its module, name, first line and bytecode
+        (values captured by closure are not part of it)
+        """
+        time_filter = (self.time_filter, self._get_function_identity(self.get_time)) \
+            if hasattr(self, 'time_filter') else None
+        configuration = (self._model._meta.label, sorted(self.filters.items()), self.index, self.values,
+                         sorted(self.labels.items()), self.unit, time_filter, self.downsample, self.resample,
+                         self.aggregation)
+        return hashlib.md5(repr(configuration).encode()).hexdigest()
+
+    @staticmethod
+    def _get_function_identity(function):
+        code = getattr(function, '__code__', None)
+        return (getattr(function, '__module__', None), getattr(function, '__qualname__', repr(function)),
+                code.co_firstlineno if code is not None else None,
+                hashlib.md5(code.co_code).hexdigest() if code is not None else None)
+
+    @property
+    def name(self):
+        return self._model.__name__
+
+    @property
+    def batch_key(self):
+        """ configurations with equal batch_key differ only in values/labels/unit and can share one query """
+        time_filter = (self.time_filter, self.get_time) if hasattr(self, 'time_filter') else None
+        return (self._model, repr(sorted(self.filters.items())), time_filter, tuple(self.index), self.loader,
+                self.resample, self.aggregation)
+
+    def get_df(self, context):
+        """ DataFrame of context, frame set by deprecated df setter is returned as it is """
+        if hasattr(self, '_df'):
+            return self._df
+        return self.transform_frame(self.read_queryset(context), context)
+
     @classmethod
     def set_optimization_calc_conf(cls, opt_calc, opt_conf):
+        """ deprecated, pass PlotContext to get_df/get_queryset instead """
+        warnings.warn('PlotConfig.set_optimization_calc_conf is deprecated, pass PlotContext to get_df/get_queryset',
+                      DeprecationWarning, stacklevel=2)
         cls.optimization_calculation = opt_calc
         cls.optimization_configuration = opt_conf
 
-    @property
-    def name(self):
-        return self._model.__name__
+    def _get_deprecated_context(self):
+        calculation = self.optimization_calculation
+        if calculation is None:
+            raise AttributeError('set_optimization_calc_conf was not called')
+        return PlotContext(calculation, self.optimization_configuration, calculation.start_time, calculation.end_time)
 
     @property
     def df(self):
+        """
+        deprecated, DataFrame of calculation given to set_optimization_calc_conf, use get_df(context),
+        frame set by setter is used by get_df (and views) until deleted
+        """
+        warnings.warn('PlotConfig.df is deprecated, use get_df(context)', DeprecationWarning, stacklevel=2)
         if hasattr(self, '_df'):
             return self._df
-        df = self.read_frame(self.queryset)
-        if hasattr(self, 'time_field') and self._get_field_type(self.time_field) == 'IntegerField':
-            self._convert_integer_time_series_to_datetime(df)
-        if not hasattr(self, 'time_field'):
-            return self._generate_date_range(df)
-        self._encode_dataframe_index(df)
-        df.set_index(self.index, inplace=True)
-        return df
+        return self.get_df(self._get_deprecated_context())
 
     @df.setter
     def df(self, df_value):
+        warnings.warn('PlotConfig.df is deprecated, use get_df(context)', DeprecationWarning, stacklevel=2)
         self._df = df_value
 
     @df.deleter
     def df(self):
+        warnings.warn('PlotConfig.df is deprecated, use get_df(context)', DeprecationWarning, stacklevel=2)
         del self._df
 
+    @property
+    def queryset(self):
+        """ deprecated, queryset of calculation given to set_optimization_calc_conf, use get_queryset(context) """
+        warnings.warn('PlotConfig.queryset is deprecated, use get_queryset(context)', DeprecationWarning,
+                      stacklevel=2)
+        return self.get_queryset(self._get_deprecated_context())
+
+    def transform_frame(self, df, context):
+        """ DataFrame read from queryset to DataFrame indexed by index, with datetime time field """
+        with context.timings.stage('transform', self) as record:
+            if hasattr(self, 'time_field') and self._is_integer_time_field:
+                self._convert_integer_time_series_to_datetime(df, context)
+            if not hasattr(self, 'time_field'):
+                df = self._generate_date_range(df, context)
+            else:
+                df.set_index(self.index, inplace=True)
+            record.rows = len(df)
+            return df
+
+    def load_frame(self, queryset, values=None):
+        if self.loader == 'read_frame':
+            return self.read_frame(queryset)
+        return LOADERS[self.loader](queryset, values or self.all_values)
+
     @staticmethod
     def read_frame(queryset):
         return read_frame(queryset)
 
+    def get_queryset(self, context, values=None):
+        values = values or self.all_values
+        return self._model.objects.filter(**self.get_filters(context)).values(*values).order_by(*self.index)
+
+    def read_queryset(self, context, values=None):
+        """ DataFrame with columns values of queryset for context, see read_values """
+        with context.timings.stage('query', self) as record:
+            frame = self.read_values(self._model.objects.filter(**self.get_filters(context)),
+                                     list(values or self.all_values), context)
+            record.rows = len(frame)
+            return frame
+
+    def read_values(self, queryset, values, context, groups=()):
+        """
+        DataFrame with columns values read from filtered queryset, when resampled (see is_resampled) rows are
+        aggregated foreach time bucket and group of other index attributes and groups
+        """
+        if not self.is_resampled(context):
+            return self.load_frame(queryset.values(*values).order_by(*self.index), values)
+        frequency = FREQUENCIES[self.get_frequency(context)]
+        grouping = [value for value in values if value in self.index or value in groups]
+        if self.aggregation == 'last':
+            frame = self.load_frame(queryset.values(*values).order_by(*self.index), values)
+            frame[self.time_field] = self._get_time_buckets(frame.loc[:, self.time_field], frequency)
+            return frame.groupby(grouping, sort=False, as_index=False).last().loc[:, values]
+
+        aliases = {value: value if value in grouping else '{}_{}'.format(self.aggregation, value.replace('__', '_'))
+                   for value in values}
+        aliases[self.time_field] = self.TIME_BUCKET
+        aggregation = AGGREGATIONS[self.aggregation]
+        queryset = queryset.annotate(**{self.TIME_BUCKET: self._get_time_bucket(frequency, context)})
+        queryset = queryset.values(*(aliases[value] for value in grouping)).annotate(
+            **{aliases[value]: aggregation(value) for value in values if value not in grouping})
+        fields = [aliases[value] for value in values]
+        frame = self.load_frame(queryset.order_by(*(aliases[value] for value in self.index)), fields)
+        return frame.rename(columns={alias: value for value, alias in aliases.items()}).loc[:, values]
+
+    def is_chunked(self, context):
+        """ rows of time series grouped by first index attribute are read in chunks """
+        return (self.chunk_memory is not None and hasattr(self, 'time_field') and len(self.index) > 1
+                and not self.is_resampled(context) and not hasattr(self, '_df'))
+
+    def iter_group_frames(self, context, values=None):
+        """
+        yields (value of first index attribute, DataFrame indexed by rest of index) foreach group of rows,
+        rows are read in chunks fitting chunk_memory, group is transformed and emitted when next group starts
+        in queryset ordered by index, so only chunk and rows of unfinished group are kept in memory,
+        rows of one group are not bounded by chunk_memory and have to fit in memory
+        """
+        values = list(values or self.all_values)
+        queryset = self._model.objects.filter(**self.get_filters(context)).order_by(*self.index)
+        chunk_size = max(1, self.chunk_memory // (FETCHED_VALUE_SIZE * len(values)))
+        chunks = iter_frame_chunks(queryset, values, CHUNKS[self.loader], chunk_size)
+        unfinished, unfinished_key = [], None
+        while True:
+            with context.timings.stage('query', self) as record:
+                chunk = next(chunks, None)
+                record.rows = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                break
+            if chunk.empty:
+                continue
+            keys = chunk.loc[:, self.index[0]].values
+            group_starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+            if unfinished and keys[0] != unfinished_key:
+                group_starts = np.concatenate([[0], group_starts])
+            if len(group_starts):
+                finished = unfinished + [chunk.iloc[:group_starts[-1]]]
+                yield from self._iter_group_frames(pd.concat(finished, ignore_index=True), context)
+                unfinished = [chunk.iloc[group_starts[-1]:]]
+            else:
+                unfinished.append(chunk)
+            unfinished_key = keys[-1]
+        if unfinished:
+            yield from self._iter_group_frames(pd.concat(unfinished, ignore_index=True), context)
+
+    def _iter_group_frames(self, frame, context):
+        if frame.empty:
+            return
+        frame = self.transform_frame(frame, context)
+        keys = frame.index.get_level_values(0)
+        boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        for start, end in zip([0, *boundaries], [*boundaries, len(frame)]):
+            yield keys[start], frame.iloc[start:end].droplevel(0)
+
+    def get_frequency(self, context):
+        return context.frequency or self.resample or self.TIME_FREQUENCE
+
+    def is_resampled(self, context):
+        """ rows are aggregated in time buckets coarser than TIME_FREQUENCE, time field has to be in index """
+        return (hasattr(self, 'time_field') and self.time_field in self.index
+                and self.get_frequency(context) != self.TIME_FREQUENCE)
+
+    def _get_time_bucket(self, frequency, context):
+        """ database expression of time bucket start, integer time field buckets count from calculation start """
+        if self._is_integer_time_field:
+            return ExpressionWrapper(Floor(F(self.time_field) / frequency.hours) * frequency.hours,
+                                     output_field=IntegerField())
+        return Trunc(self.time_field, frequency.trunc_kind, output_field=DateTimeField(),
+                     tzinfo=context.optimization_calculation.start_time.tzinfo)
+
+    def _get_time_buckets(self, times, frequency):
+        """ start of time bucket foreach time of series, same as _get_time_bucket """
+        if hasattr(self, 'time_field') and self._is_integer_time_field:
+            return times // frequency.hours * frequency.hours
+        buckets = times.dt.floor('D' if frequency.hours >= 24 else 'H')
+        if frequency.trunc_kind == 'week':
+            buckets -= pd.to_timedelta(buckets.dt.weekday, unit='D')
+        return buckets
+
+    def get_data_version(self, context):
+        """ number of rows and last time in queryset, cheap aggregate changing when rows are added or removed """
+        aggregates = {'count': Count('pk')}
+        if hasattr(self, 'time_field'):
+            aggregates['last_time'] = Max(self.time_field)
+        return sorted(self._model.objects.filter(**self.get_filters(context)).aggregate(**aggregates).items())
+
+    def iter_calculations_frames(self, contexts, values=None):
+        """
+        yields (context, frame read from queryset) foreach context, all of them are read by one query
+        when time_filter is range lookup, its range covers time frames of all contexts and is cut foreach context,
+        with other time_filter lookups (f.e. hour__lte) each context is read by its own query
+        """
+        values = list(values or self.all_values)
+        if hasattr(self, 'time_filter') and not all(self._is_range(self.get_time_filter_value(context))
+                                                    for context in contexts):
+            for context in contexts:
+                yield context, self.read_queryset(context, values)
+            return
+        key_field = self._calculation_key_field
+        queryset = self._model.objects.filter(**self.get_calculations_filters(contexts))
+        if key_field is not None:
+            queryset = queryset.annotate(**{self.CALCULATION_KEY: F(key_field)})
+            values.append(self.CALCULATION_KEY)
+        with contexts[0].timings.stage('query', self) as record:
+            frame = self.read_values(queryset, values, contexts[0], groups=(self.CALCULATION_KEY,))
+            record.rows = len(frame)
+        positions = frame.groupby(self.CALCULATION_KEY, sort=False).indices if key_field is not None else None
+        for context in contexts:
+            calculation_frame = frame
+            if key_field is not None:
+                calculation_frame = frame.iloc[positions.get(getattr(context, key_field).id, [])]
+            if hasattr(self, 'time_filter'):
+                start, end = self.get_time_filter_value(context)
+                if self.is_resampled(context):
+                    start = self._get_time_buckets(pd.Series([start]), FREQUENCIES[self.get_frequency(context)])[0]
+                calculation_frame = calculation_frame[calculation_frame.loc[:, self.time_field].between(start, end)]
+            yield context, calculation_frame
+
+    def get_calculations_filters(self, contexts):
+        """ filters for several contexts at once """
+        filters = dict(self.filters)
+        if hasattr(self, 'time_filter'):
+            time_filter_values = [self.get_time_filter_value(context) for context in contexts]
+            filters[self.time_filter] = (min(value[0] for value in time_filter_values),
+                                         max(value[1] for value in time_filter_values))
+
+        if hasattr(self._model, 'optimization_calculation'):
+            filters['optimization_calculation__in'] = sorted({context.optimization_calculation.id
+                                                              for context in contexts})
+
+        if hasattr(self._model, 'optimization_configuration'):
+            filters['optimization_configuration__in'] = sorted({context.optimization_configuration.id
+                                                                for context in contexts})
+        return filters
+
     @property
-    def queryset(self):
-        self._set_time_filter(self.optimization_calculation.start_time, self.optimization_calculation.end_time)
+    def _calculation_key_field(self):
+        for field in ('optimization_calculation', 'optimization_configuration'):
+            if hasattr(self._model, field):
+                return field
+        return None
+
+    def get_filters(self, context):
+        """ filters of configuration with time frame and optimization calculation/configuration of context """
+        filters = dict(self.filters)
+        if hasattr(self, 'time_filter'):
+            filters[self.time_filter] = self.get_time_filter_value(context)
 
         if hasattr(self._model, 'optimization_calculation'):
-            self.filters['optimization_calculation'] = self.optimization_calculation.id
+            filters['optimization_calculation'] = context.optimization_calculation.id
 
         if hasattr(self._model, 'optimization_configuration'):
-            self.filters['optimization_configuration'] = self.optimization_configuration.id
+            filters['optimization_configuration'] = context.optimization_configuration.id
+        return filters
 
-        return self._model.objects.filter(**self.filters).values(*self.all_values).order_by(*self.index)
+    def get_time_filter_value(self, context):
+        """
+        value of time_filter for time frame of context, integer time field counts hours from calculation start,
+        bounds narrower than calculation time frame replace bounds of range given by get_time,
+        any other value of get_time (f.e. for lookup hour__lte) is used as it is
+        """
+        calculation = context.optimization_calculation
+        value = self.get_time(calculation.start_time, context.end_time)
+        if not self._is_range(value):
+            return value
+        start, end = value
+        if context.start_time > calculation.start_time:
+            start = context.start_time
+            if self._is_integer_time_field:
+                start = int(np.ceil((context.start_time - calculation.start_time) / pd.Timedelta(hours=1)))
+        if context.end_time < calculation.end_time:
+            end = context.end_time
+            if self._is_integer_time_field:
+                end = int(np.floor((context.end_time - calculation.start_time) / pd.Timedelta(hours=1)))
+        return start, end
 
-    def _set_time_filter(self, start_time=0, end_time=0):
-        if not hasattr(self, 'time_filter'):
-            return
-        self.filters[self.time_filter] = self.get_time(start_time, end_time)
+    @staticmethod
+    def _is_range(value):
+        return isinstance(value, (tuple, list)) and len(value) == 2
+
+    @property
+    def _is_integer_time_field(self):
+        return self._get_field_type(self.time_field) == 'IntegerField'
 
     def _get_field_type(self, field):
         return self._model._meta.get_field(field).get_internal_type()
 
-    def _convert_integer_time_series_to_datetime(self, df):
-        convert_int_to_datetime = lambda x: timedelta(hours=x) + self.optimization_calculation.start_time
-        df.loc[:, self.time_field] = df.loc[:, self.time_field].apply(convert_int_to_datetime)
+    def _convert_integer_time_series_to_datetime(self, df, context):
+        hours = pd.to_timedelta(df.loc[:, self.time_field], unit='h')
+        df[self.time_field] = hours + context.optimization_calculation.start_time
 
-    def _generate_date_range(self, df):
+    def _generate_date_range(self, df, context):
+        """
+        repeats first row of each index foreach hour of optimization calculation (foreach time bucket when resampled),
+        columns keep their dtypes
+        """
         df.set_index(self.index, inplace=True)
+        df = df.loc[~df.index.duplicated(), self.values]
 
-        start_time = self.optimization_calculation.start_time
-        end_time = self.optimization_calculation.end_time
-        rng = pd.date_range(start=start_time, end=end_time, freq=self.TIME_FREQUENCE).to_pydatetime()
+        frequency = self.get_frequency(context)
+        if frequency == self.TIME_FREQUENCE:
+            start_time = context.optimization_calculation.start_time
+            end_time = context.optimization_calculation.end_time
+            rng = pd.date_range(start=start_time, end=end_time, freq=self.TIME_FREQUENCE)
+            rng = rng[(rng >= context.start_time) & (rng <= context.end_time)]
+        else:
+            frequency = FREQUENCIES[frequency]
+            start_time = self._get_time_buckets(pd.Series([context.start_time]), frequency)[0]
+            rng = pd.date_range(start=start_time, end=context.end_time, freq=frequency.date_range_freq)
         index = pd.MultiIndex.from_product([df.index, rng])
 
-        date_range = pd.DataFrame(columns=self.values, index=index)
-        self._set_values_foreach_date_range_group(date_range, df)
-
-        return date_range
-
-    def _encode_dataframe_index(self, df):
-        for index in self.index:
-            series = df.loc[:, index]
-            if hasattr(series, 'str') and not hasattr(series.str, 'decode'):
-                df.loc[:, index] = series.str.encode('utf-8')
-
-    def _set_values_foreach_date_range_group(self, date_range, df):
-        for index in df.index:
-            date_range.loc[index] = df.loc[index].iloc[0]
+        data = {value: np.repeat(df[value].values, len(rng)) for value in self.values}
+        return pd.DataFrame(data, index=index, columns=self.values)
 
     @staticmethod
     def opt_calc_filter_delta(start_time, end_time):
@@ -1,11 +1,31 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from rest_framework.generics import ListAPIView
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from collections import namedtuple
-from django.http import HttpResponseNotFound, HttpResponseServerError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+import hashlib
+from django.db import connections
+import numpy as np
+import pandas as pd
+from django.http import (HttpResponse, HttpResponseBadRequest, HttpResponseNotFound, HttpResponseServerError,
+                         StreamingHttpResponse)
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
 
-from CommunicationHubRestApi.models import OptimizationCalculation, OptimizationConfiguration
+from CommunicationHubRestApi.models import OptimizationCalculation
 from CommunicationHubRestApi.serializers import PlotDataSerializer
+from .base_configuration import FREQUENCIES, PlotContext
+from .downsampling import DOWNSAMPLERS
+from .models import PlotSnapshot
+from .renderers import PlotJSONRenderer
+from .serializers import (ColumnarPlotDataSerializer, RawPlotDataSerializer, RegularPlotDataSerializer,
+                          get_regular_freq)
+from .timings import NULL_TIMINGS, PlotTimings
 import logging
 
 log = logging.getLogger(__name__)
@@ -14,45 +34,490 @@ log = logging.getLogger(__name__)
 class OptimizationCalculationBasedPlotView(ListAPIView):
     """
     Base View for plots based on OptimizationCalculation model
-    plots_configs - list of configurations(PlotConfig class)
+    plots_configs - list of configurations(PlotConfig class), shared by requests and never changed by them,
+    request data (optimization calculation and configuration) is passed to them in plot_context
+    layout - data format of datasets chosen by GET parameter, 'points' (default), 'columnar'
+    or 'regular' (start, freq and y of series with regular time axis, x and y of the others)
+
+    Renderers with attribute raw_datasets (f.e. PlotJSONRenderer) get pandas series of datasets
+    and skip DRF serialization, add them to renderer_classes to use them,
+    binary renderers (NpzPlotRenderer, ArrowPlotRenderer) are chosen by Accept header or GET parameter format.
+
+    streaming - JSON array is written dataset by dataset while plots are computed,
+    enabled by view attribute or GET parameter stream=1 (for JSON renderers)
+    plot_cache - cache of computed datasets (f.e. cache.PlotCache instance), not used when streaming
+    max_points - GET parameter, each series is reduced to max_points by downsample algorithm of its PlotConfig
+    max_workers - DataFrames of plots_configs are built concurrently by that many threads, in order of plots_configs
+    batch_queries - plots_configs differing only in values/labels/unit share one query
+    since - GET parameter, datetime or optimization hour, only newer points are returned
+    from, to - GET parameters, datetime or optimization hour, time frame (clipped to calculation time frame)
+    page_hours - GET parameter, response covers at most page_hours hours from its start,
+    Link header (rel="next") points to next page
+    resample - GET parameter, frequency of time buckets ('H', 'D', 'W') aggregated in database,
+    overrides resample of plots_configs
+    instrumentation - stages (query, transform, group, serialize, render) of plots are timed with their row and point
+    counts, durations are sent in Server-Timing header (not for streaming), records are logged and passed
+    to export_timings
+    snapshots - requests without GET parameters other than layout get content of PlotSnapshot when it exists
+    (created by snapshots.create_snapshots or management command plot_snapshots for finished calculations),
+    calculation is loaded and conditional requests are answered before snapshot is looked up,
+    snapshots are created and served only for finished calculations (see is_calculation_finished, finished_attribute)
+    and only while data of plots_configs is unchanged
+    conditional_requests - responses have ETag (and Last-Modified from last_modified_attribute of calculation),
+    requests with matching If-None-Match/If-Modified-Since get 304 without computing plots
+    batch - view (as_view(batch=True)) answers map calculation id -> datasets foreach calculation
+    of GET parameter calculation_ids (comma separated), plots_configs sharing query are read by one query
+    for all calculations (by query per calculation when time_filter is not range lookup);
+    supports layout, max_points, resample and instrumentation, GET parameters since, from, to and page_hours
+    are rejected (400), streaming, plot_cache, snapshots and conditional requests are not used
     """
     plots_configs = None
+    layout_query_param = 'layout'
+    default_layout = 'points'
+    streaming = False
+    stream_query_param = 'stream'
+    plot_cache = None
+    max_points_query_param = 'max_points'
+    max_workers = 1
+    batch_queries = True
+    since_query_param = 'since'
+    from_query_param = 'from'
+    to_query_param = 'to'
+    page_hours_query_param = 'page_hours'
+    resample_query_param = 'resample'
+    instrumentation = False
+    snapshots = False
+    finished_attribute = None
+    conditional_requests = False
+    last_modified_attribute = None
+    batch = False
+    calculation_ids_query_param = 'calculation_ids'
 
     def __init__(self, *args, **kwargs):
         self.optimization_calculation = -1
-        self._pandas_list = PandasList()
+        self.plot_context = None
+        self.etag = None
+        self.last_modified = None
+        self.next_page_start = None
+        self.timings = NULL_TIMINGS
+        self._pandas_list = None
         super().__init__(*args, **kwargs)
 
     def get(self, request, *args, **kwargs):
+        if self.batch:
+            return self.get_batch(request)
+        response = self.initial_plot_request(request, kwargs)
+        if response is not None:
+            return response
+        response = self.get_snapshot_response(request)
+        if response is not None:
+            return self.set_plot_headers(response)
+        if self.is_streaming:
+            response = StreamingHttpResponse(self.stream_datasets(), content_type='application/json')
+        else:
+            response = super().get(request, *args, **kwargs)
+        return self.set_plot_headers(response)
+
+    def initial_plot_request(self, request, kwargs):
+        """
+        loads optimization calculation and validates GET parameters into plot_context,
+        returns response when plots should not be computed (error or not modified)
+        """
         try:
             calculation_id = kwargs.pop('calculation_id')
-            self.optimization_calculation = OptimizationCalculation.objects.get(id=calculation_id)
+            self.optimization_calculation = self.get_optimization_calculation(calculation_id)
         except KeyError:
             return HttpResponseServerError('No calculation ID given')
         except OptimizationCalculation.DoesNotExist:
             return HttpResponseNotFound('Optimization Calculation with ID {} not found'.format(calculation_id))
-        if self.plots_configs:
-            opt_calc = OptimizationCalculation.objects.get(id=calculation_id)
-            opt_conf = OptimizationConfiguration.objects.get(id=opt_calc.optimization_configuration_id)
-            self.plots_configs[0].set_optimization_calc_conf(opt_calc, opt_conf)
-        return super().get(request, *args, **kwargs)
+        response = self.validate_query_params()
+        if response is not None:
+            return response
+        if self.instrumentation:
+            self.timings = PlotTimings()
+        times = {}
+        for param in (self.since_query_param, self.from_query_param, self.to_query_param):
+            try:
+                times[param] = self.parse_time(request.query_params.get(param))
+            except ValueError:
+                return HttpResponseBadRequest('{} has to be datetime or optimization hour'.format(param))
+        self.plot_context = self.get_plot_context(times[self.since_query_param], times[self.from_query_param],
+                                                  times[self.to_query_param])
+        if self.conditional_requests:
+            self.etag, last_modified = self.get_etag(), self.get_last_modified()
+            self.last_modified = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+            return self.set_plot_headers(response) if response is not None else None
+        return None
+
+    def get_snapshot_response(self, request):
+        """
+        content of PlotSnapshot of loaded calculation (see initial_plot_request),
+        None when there is none or request has other parameters
+        """
+        if not self.snapshots or set(request.query_params) - {self.layout_query_param}:
+            return None
+        if not self.is_calculation_finished(self.optimization_calculation):
+            return None
+        snapshot = PlotSnapshot.objects.filter(view=self.view_name, calculation_id=self.optimization_calculation.id,
+                                               key=self.get_snapshot_key()).only('content', 'content_type').first()
+        if snapshot is None:
+            return None
+        return HttpResponse(bytes(snapshot.content), content_type=snapshot.content_type)
+
+    def get_snapshot_key(self):
+        """
+        changes with plots_configs, their data (see PlotConfig.get_data_version), layout and format
+        of accepted renderer
+        """
+        versions = tuple((plot.fingerprint, plot.get_data_version(self.plot_context))
+                         for plot in self.plots_configs or [])
+        key = repr((versions, self.layout, self.request.accepted_renderer.format))
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def is_calculation_finished(self, calculation):
+        """ attribute finished_attribute of calculation is true, without it calculation time frame has passed """
+        if self.finished_attribute is not None:
+            return bool(getattr(calculation, self.finished_attribute))
+        return calculation.end_time <= timezone.now()
+
+    def validate_query_params(self):
+        """ bad request response for invalid layout or max_points """
+        if self.layout not in LAYOUTS:
+            return HttpResponseBadRequest('Unknown layout {}'.format(self.layout))
+        try:
+            if self.max_points is not None and self.max_points < 3:
+                raise ValueError
+        except ValueError:
+            return HttpResponseBadRequest('max_points has to be integer greater than 2')
+        try:
+            if self.page_hours is not None and self.page_hours < 1:
+                raise ValueError
+        except ValueError:
+            return HttpResponseBadRequest('page_hours has to be positive integer')
+        if self.resample is not None and self.resample not in FREQUENCIES:
+            return HttpResponseBadRequest('resample has to be one of {}'.format(', '.join(FREQUENCIES)))
+        return None
+
+    def get_plot_context(self, since=None, start_time=None, end_time=None):
+        """
+        context of time frame from start_time to end_time, only after since,
+        narrowed to page_hours hours when given (next_page_start is start of following page)
+        """
+        if since is not None:
+            since += timedelta(microseconds=1)
+            start_time = max(start_time, since) if start_time is not None else since
+        context = PlotContext.for_calculation(self.optimization_calculation, start_time, end_time, self.resample)
+        context = context._replace(timings=self.timings)
+        if self.page_hours is not None:
+            page_end = context.start_time + timedelta(hours=self.page_hours)
+            if page_end <= context.end_time:
+                self.next_page_start = page_end
+                context = context._replace(end_time=page_end - timedelta(microseconds=1))
+        return context
+
+    def set_plot_headers(self, response):
+        self.set_conditional_headers(response)
+        if self.next_page_start is not None:
+            url = replace_query_param(self.request.build_absolute_uri(), self.from_query_param,
+                                      self.next_page_start.isoformat())
+            response['Link'] = '<{}>; rel="next"'.format(url)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """ with instrumentation response is rendered here to record render stage before Server-Timing is set """
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.timings and not response.streaming:
+            if isinstance(response, Response):
+                with self.timings.stage('render'):
+                    response.render()
+            response['Server-Timing'] = self.timings.server_timing()
+            self.finish_timings()
+        return response
+
+    def finish_timings(self):
+        """ logs records of timings and passes them to export_timings """
+        records = [record.as_dict() for record in self.timings.records]
+        log.info('plot timings', extra={'plot_view': type(self).__name__,
+                                        'calculation_id': getattr(self.optimization_calculation, 'id', None),
+                                        'plot_timings': records, 'plot_total': self.timings.total})
+        self.export_timings(self.timings)
+
+    def export_timings(self, timings):
+        """ hook for metrics backend, called with PlotTimings of request when instrumentation is set """
+        pass
+
+    def list(self, request, *args, **kwargs):
+        """ ListAPIView.list with serialization recorded in timings """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        with self.timings.stage('serialize'):
+            data = self.get_serializer(queryset if page is None else page, many=True).data
+        return self.get_paginated_response(data) if page is not None else Response(data)
+
+    def get_batch(self, request):
+        try:
+            calculation_ids = self.calculation_ids
+        except ValueError:
+            return HttpResponseBadRequest('calculation_ids has to be comma separated list of integers')
+        if not calculation_ids:
+            return HttpResponseBadRequest('No calculation IDs given')
+        unsupported = [param for param in (self.since_query_param, self.from_query_param, self.to_query_param,
+                                           self.page_hours_query_param) if param in request.query_params]
+        if unsupported:
+            return HttpResponseBadRequest('{} not supported for batch of calculations'.format(', '.join(unsupported)))
+        response = self.validate_query_params()
+        if response is not None:
+            return response
+        if self.instrumentation:
+            self.timings = PlotTimings()
+        calculations = {calculation.id: calculation
+                        for calculation in self.get_optimization_calculations(calculation_ids)}
+        missing = [calculation_id for calculation_id in calculation_ids if calculation_id not in calculations]
+        if missing:
+            return HttpResponseNotFound('Optimization Calculations with IDs {} not found'.format(
+                ', '.join(map(str, missing))))
+        contexts = [PlotContext.for_calculation(calculations[calculation_id], frequency=self.resample)._replace(
+            timings=self.timings) for calculation_id in calculation_ids]
+        pd_list_class, serializer_class = (SeriesPandasList, RawPlotDataSerializer) if self.raw_datasets \
+            else LAYOUTS[self.layout]
+        data = {}
+        for context, plots_dfs in self.iter_calculations_plots_dfs(contexts):
+            self.plot_context = context
+            pd_list = pd_list_class()
+            for plot, df in plots_dfs:
+                self.add_plot_by_source_to_pandas_list(plot, pd_list, df)
+            with self.timings.stage('serialize'):
+                data[context.optimization_calculation.id] = serializer_class(pd_list, many=True).data
+        return Response(data)
+
+    def iter_calculations_plots_dfs(self, contexts):
+        """ yields (context, list of (plot, DataFrame) in order of plots_configs) foreach context """
+        plots_configs = self.plots_configs or []
+        dfs = [{} for _ in contexts]
+        for batch in self.plan_batches(plots_configs):
+            plots = [plots_configs[position] for position in batch]
+            values = list(dict.fromkeys(value for plot in plots for value in plot.all_values))
+            for context_dfs, (context, frame) in zip(dfs, plots[0].iter_calculations_frames(contexts, values)):
+                for position, plot in zip(batch, plots):
+                    context_dfs[position] = plot.transform_frame(frame.loc[:, plot.all_values].copy(), context)
+        for context, context_dfs in zip(contexts, dfs):
+            yield context, [(plot, context_dfs[position]) for position, plot in enumerate(plots_configs)]
+
+    def set_conditional_headers(self, response):
+        if self.conditional_requests:
+            response['ETag'] = self.etag
+            if self.last_modified:
+                response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+    def parse_time(self, value):
+        """
+        datetime or optimization hour (hours from calculation start) given in GET parameter,
+        naive datetime is taken as UTC for aware calculation times, aware datetime is made naive in current time zone
+        for naive calculation times (USE_TZ = False)
+        """
+        if not value:
+            return None
+        start_time = self.optimization_calculation.start_time
+        if value.lstrip('-').isdigit():
+            return start_time + timedelta(hours=int(value))
+        time = parse_datetime(value)
+        if time is None:
+            raise ValueError(value)
+        if timezone.is_naive(time) and timezone.is_aware(start_time):
+            time = timezone.make_aware(time, dt_timezone.utc)
+        elif timezone.is_aware(time) and timezone.is_naive(start_time):
+            time = timezone.make_naive(time)
+        return time
+
+    def get_etag(self):
+        """ changes with request parameters, plots_configs and their data (see PlotConfig.get_data_version) """
+        versions = [plot.get_data_version(self.plot_context) for plot in self.plots_configs or []]
+        key = repr((self.get_cache_key(), versions, self.is_streaming, self.request.accepted_renderer.format))
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def get_last_modified(self):
+        if self.last_modified_attribute is None:
+            return None
+        return getattr(self.optimization_calculation, self.last_modified_attribute)
+
+    @staticmethod
+    def get_optimization_calculation(calculation_id):
+        return OptimizationCalculation.objects.select_related('optimization_configuration').get(id=calculation_id)
+
+    @staticmethod
+    def get_optimization_calculations(calculation_ids):
+        return OptimizationCalculation.objects.select_related('optimization_configuration').filter(
+            id__in=calculation_ids)
 
     def get_queryset(self):
+        if self.plot_cache is None:
+            return self.build_pd_list()
+        key = self.get_cache_key()
+        pd_list = self.plot_cache.get(key)
+        if pd_list is None:
+            pd_list = self.build_pd_list()
+            self.plot_cache.set(key, pd_list, self.optimization_calculation.id)
+        return pd_list
+
+    def build_pd_list(self, plots_dfs=None):
+        """ PandasList of datasets from (plot, DataFrame) pairs, by default built by iter_plots_dfs """
         pd_list = self.get_pd_list()
-        for plot in self.plots_configs:
-            self.add_plot_by_source_to_pandas_list(plot, pd_list)
+        for plot, df in self.iter_plots_dfs() if plots_dfs is None else plots_dfs:
+            self.add_plot_by_source_to_pandas_list(plot, pd_list, df)
         return pd_list
 
-    def add_plot_by_source_to_pandas_list(self, plot, pd_list):
-        df = plot.df
+    def iter_plots_dfs(self):
+        """
+        yields (plot, DataFrame) in order of plots_configs,
+        batches (see plan_batches) are built when first of their plots is needed, when max_workers > 1
+        up to max_workers following batches are built ahead concurrently
+        """
+        plots_configs = self.plots_configs or []
+        batches = self.plan_batches(plots_configs)
+        batch_of_position = {position: batch for batch in batches for position in batch}
+        workers = min(self.max_workers, len(batches))
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        futures = {}
+        queued = iter(batches)
+
+        def submit_batches():
+            """ keeps at most workers batches in flight, batches are needed in order of plan_batches """
+            for batch in queued:
+                futures[batch] = executor.submit(self._build_batch_dfs, batch)
+                if len(futures) >= workers:
+                    break
+
+        def build_batch_dfs(batch):
+            if executor is None:
+                return self.build_batch_dfs(batch)
+            future = futures.pop(batch)
+            submit_batches()
+            return future.result()
+
+        dfs = {}
+        try:
+            if executor is not None:
+                submit_batches()
+            for position, plot in enumerate(plots_configs):
+                if position not in dfs:
+                    dfs.update(build_batch_dfs(batch_of_position[position]))
+                yield plot, dfs.pop(position)
+        finally:
+            if executor is not None:
+                for future in futures.values():
+                    future.cancel()
+                executor.shutdown()
+
+    def plan_batches(self, plots_configs):
+        """ tuples of plots_configs positions, plots in one batch are read by one query when batch_queries is set """
+        if not self.batch_queries:
+            return [(position,) for position in range(len(plots_configs))]
+        batches = {}
+        for position, plot in enumerate(plots_configs):
+            key = plot.batch_key if plot.chunk_memory is None and not hasattr(plot, '_df') else ('single', position)
+            batches.setdefault(key, []).append(position)
+        return [tuple(batch) for batch in batches.values()]
+
+    def build_batch_dfs(self, batch):
+        """
+        map position -> DataFrame foreach plot in batch, one query for union of their values,
+        chunked plot (see PlotConfig.is_chunked) gets lazy iterator of its groups frames instead
+        """
+        plots = [self.plots_configs[position] for position in batch]
+        if len(plots) == 1 and plots[0].is_chunked(self.plot_context):
+            return {batch[0]: plots[0].iter_group_frames(self.plot_context)}
+        if len(plots) == 1:
+            return {batch[0]: plots[0].get_df(self.plot_context)}
+        values = list(dict.fromkeys(value for plot in plots for value in plot.all_values))
+        frame = plots[0].read_queryset(self.plot_context, values)
+        return {position: plot.transform_frame(frame.loc[:, plot.all_values].copy(), self.plot_context)
+                for position, plot in zip(batch, plots)}
+
+    def _build_batch_dfs(self, batch):
+        try:
+            return self.build_batch_dfs(batch)
+        finally:
+            connections.close_all()
+
+    @property
+    def view_name(self):
+        return '{}.{}'.format(type(self).__module__, type(self).__qualname__)
+
+    def get_cache_key(self):
+        fingerprints = tuple(plot.fingerprint for plot in self.plots_configs)
+        return (self.view_name, self.optimization_calculation.id, fingerprints, type(self.get_pd_list()).__name__,
+                self.max_points, self.plot_context.start_time, self.plot_context.end_time, self.plot_context.frequency)
+
+    def add_plot_by_source_to_pandas_list(self, plot, pd_list, df=None):
+        with self.timings.stage('group', plot) as record:
+            for data, label in self.iter_plot_series(plot, df):
+                pd_list.add_ds(data, label, unit=plot.unit)
+                record.points += len(data)
+
+    def iter_plot_series(self, plot, df=None):
+        """
+        yields (data series, label) foreach dataset of plot, frames are released when consumed,
+        df is DataFrame or iterator of (source name, DataFrame) of chunked plot (see PlotConfig.iter_group_frames)
+        """
+        if df is None and plot.is_chunked(self.plot_context):
+            df = plot.iter_group_frames(self.plot_context)
+        if df is not None and not isinstance(df, pd.DataFrame):
+            for source_name, frame in df:
+                for value in plot.values:
+                    yield self.downsample(plot, frame.loc[:, value]), plot.labels.get(source_name, source_name)
+            return
+        df = plot.get_df(self.plot_context) if df is None else df
         if not self._is_df_multiindex(df):
-            pd_list.add_ds(df.loc[:, plot.values[0]], plot.name, unit=plot.unit)
+            yield self.downsample(plot, df.loc[:, plot.values[0]]), plot.name
             return
-        for source_name, frame in self.group_df_by_index(df):
-            frame.index = frame.index.droplevel()
+        for source_name, series in self.iter_groups_series(df, plot.values):
             for value in plot.values:
                 label = plot.labels.get(source_name, source_name)
-                pd_list.add_ds(frame.loc[:,value], label, unit=plot.unit)
+                yield self.downsample(plot, series[value]), label
+
+    def iter_groups_series(self, df, values):
+        """
+        yields (source name, map value -> series indexed by rest of index) foreach group of first index level,
+        rows sorted by first level (queryset is ordered by index) are split by group boundaries into array views,
+        otherwise they are grouped with group_df_by_index
+        """
+        codes = df.index.codes[0]
+        if not len(codes) or codes[0] < 0 or np.any(codes[1:] < codes[:-1]):
+            for source_name, frame in self.group_df_by_index(df):
+                frame.index = frame.index.droplevel()
+                yield source_name, {value: frame.loc[:, value] for value in values}
+            return
+        boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(codes)]])
+        inner_index = df.index.droplevel(0)
+        columns = {value: df.loc[:, value].values for value in values}
+        for source_name, start, end in zip(df.index.levels[0].take(codes[starts]), starts, ends):
+            index = inner_index[start:end]
+            yield source_name, {value: pd.Series(column[start:end], index=index, name=value)
+                                for value, column in columns.items()}
+
+    def downsample(self, plot, data):
+        max_points = self.max_points
+        if max_points is None or len(data) <= max_points:
+            return data
+        return DOWNSAMPLERS[plot.downsample](data, max_points)
+
+    def stream_datasets(self):
+        renderer = PlotJSONRenderer()
+        separator = '['
+        for plot, df in self.iter_plots_dfs():
+            with self.timings.stage('stream', plot) as record:
+                for data, label in self.iter_plot_series(plot, df):
+                    dataset = RawPlotDataSerializer(SeriesPandasList.get_obj(data, label, unit=plot.unit)).data
+                    yield separator + renderer.encode_dataset(dataset, self.layout)
+                    separator = ','
+                    record.points += len(data)
+        yield '[]' if separator == '[' else ']'
+        if self.timings:
+            self.finish_timings()
 
     @staticmethod
     def _is_df_multiindex(df):
@@ -62,26 +527,116 @@ class OptimizationCalculationBasedPlotView(ListAPIView):
     def group_df_by_index(df):
         return df.groupby(level=0)
 
+    @property
+    def layout(self):
+        return self.request.query_params.get(self.layout_query_param, self.default_layout)
+
+    @property
+    def max_points(self):
+        max_points = self.request.query_params.get(self.max_points_query_param)
+        return int(max_points) if max_points else None
+
+    @property
+    def resample(self):
+        return self.request.query_params.get(self.resample_query_param) or None
+
+    @property
+    def page_hours(self):
+        page_hours = self.request.query_params.get(self.page_hours_query_param)
+        return int(page_hours) if page_hours else None
+
+    @property
+    def calculation_ids(self):
+        """ unique calculation ids of GET parameter in given order """
+        calculation_ids = self.request.query_params.get(self.calculation_ids_query_param, '')
+        return list(dict.fromkeys(int(calculation_id) for calculation_id in calculation_ids.split(',')
+                                  if calculation_id.strip()))
+
+    @property
+    def is_streaming(self):
+        stream = self.request.query_params.get(self.stream_query_param)
+        if self.request.accepted_renderer.format != 'json':
+            return False
+        return self.streaming if stream is None else stream.lower() in ('1', 'true')
+
+    @property
+    def raw_datasets(self):
+        return getattr(self.request.accepted_renderer, 'raw_datasets', False)
+
     def get_serializer_class(self):
-        return PlotDataSerializer
+        if self.raw_datasets:
+            return RawPlotDataSerializer
+        return LAYOUTS[self.layout][1]
 
     def get_pd_list(self):
+        if self._pandas_list is None:
+            pd_list_class = SeriesPandasList if self.raw_datasets else LAYOUTS[self.layout][0]
+            self._pandas_list = pd_list_class()
         return self._pandas_list
 
 
+PandasObj = namedtuple('PandasObj', 'label data unit')
+
+
 class PandasList(list):
     """
     Extended list with method add_ds, converting pandas data series into serializable objects
     """
 
     def add_ds(self, data, label=None, unit=''):
-        PandasObj = namedtuple('PandasObj', 'label data unit')
+        self.append(self.get_obj(data, label, unit))
+
+    @classmethod
+    def get_obj(cls, data, label=None, unit=''):
         data_col_name = data.columns[0] if hasattr(data, 'columns') else ''
         data_name = getattr(data, 'name', data_col_name)
         kwargs = {
             'label': data_name if not label else '{} {}'.format(label, data_name),
-            'data': [{'x': x, 'y': y} for x, y in zip(data.index, data.values)],
+            'data': cls.get_data(data),
             'unit': unit
         }
-        obj = PandasObj(**kwargs)
-        self.append(obj)
+        return PandasObj(**kwargs)
+
+    @staticmethod
+    def get_data(data):
+        return [{'x': x, 'y': y} for x, y in zip(data.index, data.values)]
+
+
+class ColumnarPandasList(PandasList):
+    """
+    PandasList keeping parallel x and y arrays taken straight from pandas index and values
+    """
+
+    @staticmethod
+    def get_data(data):
+        return {'x': data.index, 'y': data.values}
+
+
+class SeriesPandasList(PandasList):
+    """
+    PandasList keeping data series as they are, for renderers encoding them directly
+    """
+
+    @staticmethod
+    def get_data(data):
+        return data
+
+
+class RegularPandasList(PandasList):
+    """
+    PandasList keeping start and freq of regular time axis instead of its x array
+    """
+
+    @staticmethod
+    def get_data(data):
+        freq = get_regular_freq(data.index)
+        if freq is None:
+            return {'x': data.index, 'y': data.values}
+        return {'start': data.index[0], 'freq': freq, 'y': data.values}
+
+
+LAYOUTS = {
+    'points': (PandasList, PlotDataSerializer),
+    'columnar': (ColumnarPandasList, ColumnarPlotDataSerializer),
+    'regular': (RegularPandasList, RegularPlotDataSerializer),
+}
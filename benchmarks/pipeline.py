@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of plot pipeline stages on synthetic data, each stage timed separately with its peak memory
+
+Rows (sources x hours, value columns) are generated into temporary tables of test database
+for model with integer hours and model with datetime hours. Stages:
+query - PlotConfig.read_queryset, filtered (resampled when --resample is given) rows read by PlotConfig loader
+transform - PlotConfig.transform_frame (integer hours converted to datetime, index set)
+generate_date_range - PlotConfig without time filter, one row per source repeated foreach hour
+group - grouping by source and PandasList.add_ds
+serialize - DRF serializer with JSONRenderer
+render - PlotJSONRenderer
+
+run inside project with DJANGO_SETTINGS_MODULE set:
+python -m optimization_calculation_plots.benchmarks.pipeline --sources 100 --hours 2000 --output results.json
+python -m optimization_calculation_plots.benchmarks.pipeline --compare results.json
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import django
+
+django.setup()
+
+import numpy as np
+import pandas as pd
+from django.apps import apps
+from django.db import connection, models
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ..base_configuration import FREQUENCIES, PlotConfig, PlotContext
+from ..base_view import LAYOUTS, OptimizationCalculationBasedPlotView, SeriesPandasList
+from ..loaders import LOADERS
+from ..renderers import PlotJSONRenderer
+from ..serializers import RawPlotDataSerializer
+
+STAGES = ('query', 'transform', 'generate_date_range', 'group', 'serialize', 'render')
+CALCULATION_ID = 1
+
+
+def create_model(name, value_columns, integer_hours):
+    """ model of plotted rows with value_columns float columns, hours as integer offset or datetime """
+    app_label = apps.get_containing_app_config(__package__).label
+    attrs = {
+        '__module__': __name__,
+        'Meta': type('Meta', (), {'app_label': app_label, 'db_table': 'benchmark_{}'.format(name.lower()),
+                                  'indexes': [models.Index(fields=['optimization_calculation', 'source',
+                                                                   'optimization_hour'])]}),
+        'optimization_calculation': models.IntegerField(),
+        'source': models.CharField(max_length=64),
+        'optimization_hour': models.IntegerField() if integer_hours else models.DateTimeField(),
+    }
+    attrs.update((column, models.FloatField()) for column in value_columns)
+    return type(name, (models.Model,), attrs)
+
+
+def generate_rows(model, calculation, sources, hours, value_columns, batch_size=10000):
+    """ sources x hours rows with random values, created by bulk_create in batches """
+    integer_hours = model._meta.get_field('optimization_hour').get_internal_type() == 'IntegerField'
+    times = range(hours) if integer_hours else pd.date_range(calculation.start_time, periods=hours, freq='H')
+    rows = []
+    for source in range(sources):
+        values = np.random.rand(len(value_columns), hours) * 1000
+        for hour, time_value in enumerate(times):
+            rows.append(model(optimization_calculation=calculation.id, source='source{}'.format(source),
+                              optimization_hour=time_value,
+                              **{column: values[i, hour] for i, column in enumerate(value_columns)}))
+            if len(rows) == batch_size:
+                model.objects.bulk_create(rows)
+                rows = []
+    model.objects.bulk_create(rows)
+
+
+def get_view(context, layout):
+    view = OptimizationCalculationBasedPlotView()
+    view.request = Request(APIRequestFactory().get('/', {'layout': layout}))
+    view.plot_context = context
+    return view
+
+
+def run_pipeline(plot, context, layout, timer):
+    """ runs stages of one PlotConfig, timer(stage, function) returns result of function """
+    view = get_view(context, layout)
+    df = timer('query', lambda: plot.read_queryset(context))
+    stage = 'transform' if hasattr(plot, 'time_field') else 'generate_date_range'
+    df = timer(stage, lambda: plot.transform_frame(df, context))
+
+    pd_list_class, serializer_class = LAYOUTS[layout]
+
+    def group(pd_list):
+        view.add_plot_by_source_to_pandas_list(plot, pd_list, df)
+        return pd_list
+
+    pd_list = timer('group', lambda: group(pd_list_class()))
+    series_list = group(SeriesPandasList())
+    timer('serialize', lambda: JSONRenderer().render(serializer_class(pd_list, many=True).data))
+    timer('render', lambda: PlotJSONRenderer().render(RawPlotDataSerializer(series_list, many=True).data,
+                                                      renderer_context={'view': view}))
+    return df
+
+
+def measure(plot, context, layout, repeat):
+    """ map stage -> (minimal time of repeat runs, peak of traced memory in bytes) """
+    timings = {}
+
+    def timer(stage, function):
+        start = time.perf_counter()
+        result = function()
+        timings.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    for _ in range(repeat):
+        run_pipeline(plot, context, layout, timer)
+
+    peaks = {}
+
+    def memory_timer(stage, function):
+        tracemalloc.start()
+        try:
+            return function()
+        finally:
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    run_pipeline(plot, context, layout, memory_timer)
+    return OrderedDict((stage, (min(timings[stage]), peaks[stage])) for stage in STAGES if stage in timings)
+
+
+def run(args):
+    value_columns = ['value{}'.format(column) for column in range(args.values)]
+    start_time = pd.Timestamp('2018-01-01', tz='UTC').to_pydatetime()
+    calculation = SimpleNamespace(id=CALCULATION_ID, start_time=start_time,
+                                  end_time=start_time + pd.Timedelta(hours=args.hours - 1).to_pytimedelta(),
+                                  optimization_configuration=SimpleNamespace(id=CALCULATION_ID))
+    context = PlotContext.for_calculation(calculation, frequency=args.resample)
+    scenarios = OrderedDict()
+    for time_type in args.time_types:
+        integer_hours = time_type == 'integer'
+        model = create_model('Benchmark{}HourRow'.format(time_type.capitalize()), value_columns, integer_hours)
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(model)
+        generate_rows(model, calculation, args.sources, args.hours, value_columns)
+        time_filter = ['optimization_hour__range',
+                       PlotConfig.opt_calc_filter_delta if integer_hours else PlotConfig.opt_calc_filter_range]
+        scenarios[time_type] = PlotConfig(model, {}, time_filter, index=['source', 'optimization_hour'],
+                                          values=value_columns, loader=args.loader)
+        if integer_hours:
+            sources = model.objects.filter(optimization_hour=0)
+            scenarios['generated'] = PlotConfig(model, {'pk__in': sources.values('pk')}, [], index=['source'],
+                                                values=value_columns, loader=args.loader)
+
+    results = []
+    for scenario, plot in scenarios.items():
+        for stage, (seconds, peak) in measure(plot, context, args.layout, args.repeat).items():
+            results.append({'scenario': scenario, 'stage': stage, 'seconds': seconds, 'peak_memory': peak})
+    return results
+
+
+def load_results(path):
+    with open(path) as results_file:
+        return {(result['scenario'], result['stage']): result for result in json.load(results_file)['results']}
+
+
+def print_results(results, baseline=None):
+    for result in results:
+        line = '{scenario:<10} {stage:<20} {seconds:9.4f}s  peak: {peak_memory:>12} B'.format(**result)
+        previous = (baseline or {}).get((result['scenario'], result['stage']))
+        if previous:
+            line += '  time: {:6.2f}x  memory: {:6.2f}x'.format(result['seconds'] / previous['seconds'],
+                                                              result['peak_memory'] / max(previous['peak_memory'], 1))
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', type=int, default=100)
+    parser.add_argument('--hours', type=int, default=2000)
+    parser.add_argument('--values', type=int, default=1, help='number of value columns')
+    parser.add_argument('--time-types', nargs='+', choices=('integer', 'datetime'), default=['integer', 'datetime'])
+    parser.add_argument('--loader', choices=['read_frame'] + list(LOADERS), default='read_frame')
+    parser.add_argument('--layout', choices=list(LAYOUTS), default='points')
+    parser.add_argument('--resample', choices=list(FREQUENCIES),
+                        help='frequency of time buckets aggregated in database')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file for results')
+    parser.add_argument('--compare', help='JSON file with results of previous run, ratios to them are printed')
+    args = parser.parse_args()
+
+    old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        results = run(args)
+    finally:
+        connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+    print_results(results, load_results(args.compare) if args.compare else None)
+    if args.output:
+        parameters = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+        environment = {'python': platform.python_version(), 'django': django.get_version(),
+                       'pandas': pd.__version__, 'numpy': np.__version__, 'database': connection.vendor}
+        with open(args.output, 'w') as output_file:
+            json.dump({'parameters': parameters, 'environment': environment, 'results': results}, output_file,
+                      indent=2)
+
+
+if __name__ == '__main__':
+    main()
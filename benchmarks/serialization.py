@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of plot datasets serialization, DRF serializer with JSONRenderer against PlotJSONRenderer
+
+run inside project with DJANGO_SETTINGS_MODULE set:
+python -m optimization_calculation_plots.benchmarks.serialization --sources 100 --hours 2000
+"""
+import argparse
+import time
+
+import django
+
+django.setup()
+
+import numpy as np
+import pandas as pd
+from rest_framework.renderers import JSONRenderer
+
+from ..base_view import LAYOUTS, SeriesPandasList
+from ..renderers import PlotJSONRenderer
+from ..serializers import RawPlotDataSerializer
+
+
+def generate_series(sources, hours, start='2018-01-01'):
+    index = pd.date_range(start=start, periods=hours, freq='H', tz='UTC')
+    for source in range(sources):
+        yield 'source{}'.format(source), pd.Series(np.random.rand(hours) * 1000, index=index, name='pow')
+
+
+def drf_render(series, layout):
+    pd_list_class, serializer_class = LAYOUTS[layout]
+    pd_list = pd_list_class()
+    for label, data in series:
+        pd_list.add_ds(data, label)
+    return JSONRenderer().render(serializer_class(pd_list, many=True).data)
+
+
+def fast_render(series, layout):
+    pd_list = SeriesPandasList()
+    for label, data in series:
+        pd_list.add_ds(data, label)
+    view = argparse.Namespace(layout=layout)
+    return PlotJSONRenderer().render(RawPlotDataSerializer(pd_list, many=True).data, renderer_context={'view': view})
+
+
+def measure(render, series, layout, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        content = render(series, layout)
+        timings.append(time.perf_counter() - start)
+    return min(timings), content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', type=int, default=100)
+    parser.add_argument('--hours', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    series = list(generate_series(args.sources, args.hours))
+    for layout in LAYOUTS:
+        drf_time, drf_content = measure(drf_render, series, layout, args.repeat)
+        fast_time, fast_content = measure(fast_render, series, layout, args.repeat)
+        assert drf_content == fast_content, 'PlotJSONRenderer output differs from JSONRenderer output'
+        print('{:<10} points: {:>9}  drf: {:8.3f}s  fast: {:8.3f}s  speedup: {:5.1f}x  size: {} B'.format(
+            layout, args.sources * args.hours, drf_time, fast_time, drf_time / fast_time, len(fast_content)))
+
+
+if __name__ == '__main__':
+    main()
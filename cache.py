@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+_plot_caches = weakref.WeakSet()
+
+
+def invalidate_calculation(calculation_id=None):
+    """
+    Drop cached plots of calculation (all cached plots when calculation_id is None) in every plot cache,
+    call it when data of calculation is rewritten
+    """
+    for plot_cache in list(_plot_caches):
+        plot_cache.invalidate(calculation_id)
+
+
+class BasePlotCache:
+    """
+    Cache of plot view datasets
+
+    key - tuple (view class, calculation id, plot configurations fingerprints, ...), see view get_cache_key
+    hits, misses - counters of get calls
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._counters_lock = threading.Lock()
+        _plot_caches.add(self)
+
+    def get(self, key):
+        value = self._get(key)
+        with self._counters_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, calculation_id):
+        raise NotImplementedError
+
+    def invalidate(self, calculation_id=None):
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class PlotCache(BasePlotCache):
+    """
+    In process LRU cache
+
+    timeout - seconds after which entry expires, None for no expiry
+    max_entries - least recently used entries are evicted above this size
+    """
+
+    def __init__(self, timeout=300, max_entries=128):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, calculation_id, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, calculation_id):
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._entries[key] = (expires, calculation_id, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, calculation_id=None):
+        with self._lock:
+            if calculation_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items() if entry[1] == calculation_id]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        return dict(super().stats, size=len(self))
+
+
+class DjangoPlotCache(BasePlotCache):
+    """
+    Cache stored in django cache backend (settings.CACHES), shared between processes
+
+    timeout and eviction are configured by backend (TIMEOUT, OPTIONS MAX_ENTRIES) unless timeout is given,
+    calculation is invalidated by increasing its version which is part of entries keys
+    """
+
+    def __init__(self, alias='default', timeout=None, key_prefix='plots'):
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        super().__init__()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _get(self, key):
+        return self.cache.get(self._make_key(key))
+
+    def set(self, key, value, calculation_id):
+        kwargs = {'timeout': self.timeout} if self.timeout is not None else {}
+        self.cache.set(self._make_key(key), value, **kwargs)
+
+    def invalidate(self, calculation_id=None):
+        version_key = self._version_key(calculation_id)
+        try:
+            self.cache.incr(version_key)
+        except ValueError:
+            self.cache.set(version_key, 1, timeout=None)
+
+    def _version_key(self, calculation_id=None):
+        return '{}:version:{}'.format(self.key_prefix, '' if calculation_id is None else calculation_id)
+
+    def _make_key(self, key):
+        calculation_id = key[1]
+        versions = self.cache.get_many([self._version_key(), self._version_key(calculation_id)])
+        key = (key, sorted(versions.items()))
+        return '{}:{}'.format(self.key_prefix, hashlib.md5(repr(key).encode()).hexdigest())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shape preserving reduction of data series to at most max_points points
+"""
+import numpy as np
+import pandas as pd
+
+
+def _as_float(values):
+    if isinstance(values, pd.DatetimeIndex):
+        values = values.asi8 - values.asi8[0]
+    return np.asarray(values, dtype=float)
+
+
+def lttb(series, max_points):
+    """
+    Largest-Triangle-Three-Buckets, keeps first and last point and from each bucket between them
+    point with the largest triangle formed with previously selected point and average of next bucket
+    """
+    length = len(series)
+    if max_points >= length or max_points < 3:
+        return series
+    x = _as_float(series.index)
+    y = _as_float(series.values)
+    edges = 1 + np.arange(max_points - 1) * (length - 2) // (max_points - 2)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:-1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:-1], edges[:-1] - 1) / counts
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, length - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        area = np.abs((x[previous] - avg_x[bucket]) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y[bucket] - y[previous]))
+        previous = start + np.argmax(np.where(np.isnan(area), -1, area))
+        selected[bucket + 1] = previous
+    return series.iloc[selected]
+
+
+def min_max(series, max_points):
+    """ minimum and maximum of each of max_points / 2 equal buckets, in original order """
+    length = len(series)
+    buckets = max_points // 2
+    if max_points >= length or buckets < 1:
+        return series
+    size = -(-length // buckets)
+    buckets = -(-length // size)
+    blocks = np.full(buckets * size, np.nan)
+    blocks[:length] = _as_float(series.values)
+    blocks = blocks.reshape(buckets, size)
+    is_nan = np.isnan(blocks)
+    offsets = np.arange(buckets) * size
+    minimums = offsets + np.argmin(np.where(is_nan, np.inf, blocks), axis=1)
+    maximums = offsets + np.argmax(np.where(is_nan, -np.inf, blocks), axis=1)
+    return series.iloc[np.unique(np.concatenate([minimums, maximums]))]
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb,
+    'minmax': min_max,
+}
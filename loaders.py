@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Loaders reading queryset rows straight into typed numpy columns, without creating dict foreach row
+"""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.db.models.sql.constants import MULTI
+
+CHUNK_SIZE = 10000
+# estimated memory of one fetched value (python object referenced by row tuple) in bytes
+FETCHED_VALUE_SIZE = 64
+
+FIELD_DTYPES = {
+    'AutoField': np.int64,
+    'BigAutoField': np.int64,
+    'SmallAutoField': np.int64,
+    'IntegerField': np.int64,
+    'BigIntegerField': np.int64,
+    'SmallIntegerField': np.int64,
+    'PositiveIntegerField': np.int64,
+    'PositiveBigIntegerField': np.int64,
+    'PositiveSmallIntegerField': np.int64,
+    'FloatField': np.float64,
+    'DecimalField': np.float64,
+    'BooleanField': np.bool_,
+    'DateTimeField': 'datetime',
+    'DateField': 'datetime',
+}
+
+
+def get_field_dtype(model, name, annotations=None):
+    """
+    numpy dtype for model attribute (lookups through relations allowed) or annotation (output field of expression
+    in annotations), object when unknown or nullable
+    """
+    field = None
+    try:
+        if annotations and name in annotations:
+            field = annotations[name].output_field
+            if field.is_relation and field.many_to_one:
+                field = field.target_field
+        for part in name.split('__') if field is None else ():
+            field = model._meta.get_field(part)
+            model = field.related_model
+            if field.is_relation and field.many_to_one:
+                field = field.target_field
+    except (AttributeError, FieldDoesNotExist, FieldError):
+        return object
+    dtype = FIELD_DTYPES.get(field.get_internal_type(), object)
+    if field.null and dtype is np.int64:
+        return np.float64
+    if field.null and dtype is np.bool_:
+        return object
+    return dtype
+
+
+def iter_values_list_chunks(queryset, fields, chunk_size=CHUNK_SIZE):
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_cursor_chunks(queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    raw database rows fetched with fetchmany, database converters are not applied,
+    columns selected after fields (annotations) are reordered to order of fields
+    """
+    queryset = queryset.values_list(*fields)
+    query = queryset.query
+    compiler = query.get_compiler(using=queryset.db)
+    chunks = compiler.execute_sql(MULTI, chunked_fetch=True, chunk_size=chunk_size)
+    names = [*query.extra_select, *query.values_select, *query.annotation_select]
+    if names == list(fields):
+        yield from chunks
+        return
+    positions = [names.index(field) for field in fields]
+    for rows in chunks:
+        yield [tuple(row[position] for position in positions) for row in rows]
+
+
+def read_frame_columnar(queryset, fields, chunks=iter_values_list_chunks, chunk_size=CHUNK_SIZE):
+    dtypes = [get_field_dtype(queryset.model, field, queryset.query.annotations) for field in fields]
+    buffers = [[] for _ in fields]
+    for rows in chunks(queryset, fields, chunk_size):
+        for buffer, dtype, column in zip(buffers, dtypes, zip(*rows)):
+            buffer.append(np.array(column, dtype=object if dtype == 'datetime' else dtype))
+    data = {}
+    for field, dtype, buffer in zip(fields, dtypes, buffers):
+        column = np.concatenate(buffer) if buffer else np.array([], dtype=object if dtype == 'datetime' else dtype)
+        data[field] = pd.to_datetime(column, utc=settings.USE_TZ) if dtype == 'datetime' else column
+    return pd.DataFrame(data, columns=fields)
+
+
+def iter_frame_chunks(queryset, fields, chunks=iter_values_list_chunks, chunk_size=CHUNK_SIZE):
+    """ DataFrame foreach chunk of rows, columns typed like in read_frame_columnar """
+    dtypes = [get_field_dtype(queryset.model, field, queryset.query.annotations) for field in fields]
+    for rows in chunks(queryset, fields, chunk_size):
+        data = {}
+        for field, dtype, column in zip(fields, dtypes, zip(*rows)):
+            column = np.array(column, dtype=object if dtype == 'datetime' else dtype)
+            data[field] = pd.to_datetime(column, utc=settings.USE_TZ) if dtype == 'datetime' else column
+        yield pd.DataFrame(data, columns=fields)
+
+
+def read_frame_values_list(queryset, fields):
+    return read_frame_columnar(queryset, fields, chunks=iter_values_list_chunks)
+
+
+def read_frame_cursor(queryset, fields):
+    return read_frame_columnar(queryset, fields, chunks=iter_cursor_chunks)
+
+
+LOADERS = {
+    'values_list': read_frame_values_list,
+    'cursor': read_frame_cursor,
+}
+
+CHUNKS = {
+    'read_frame': iter_values_list_chunks,
+    'values_list': iter_values_list_chunks,
+    'cursor': iter_cursor_chunks,
+}
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from CommunicationHubRestApi.models import OptimizationCalculation
+from ...snapshots import create_snapshots, delete_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Create snapshots of plot views for finished calculations (see snapshots.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('calculation_ids', nargs='*', type=int)
+        parser.add_argument('--all', action='store_true', help='snapshots of all finished calculations')
+        parser.add_argument('--view', action='append', dest='views',
+                            help='dotted path of view, settings.PLOT_SNAPSHOT_VIEWS by default')
+        parser.add_argument('--delete', action='store_true', help='delete snapshots of calculations instead')
+
+    def handle(self, *args, **options):
+        calculation_ids = options['calculation_ids']
+        if options['all']:
+            calculation_ids = OptimizationCalculation.objects.order_by('id').values_list('id', flat=True).iterator()
+        views = [import_string(view) for view in options['views']] if options['views'] else None
+        count = 0
+        for calculation_id in calculation_ids:
+            if options['delete']:
+                count += delete_snapshots(calculation_id)
+            else:
+                count += len(create_snapshots(calculation_id, views))
+        self.stdout.write('{} snapshots {}'.format(count, 'deleted' if options['delete'] else 'created'))
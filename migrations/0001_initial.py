@@ -0,0 +1,46 @@
+# Generated by Django 4.1.13 on 2026-10-17 08:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptimizationConfiguration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.TextField(default='default configuration')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlotSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=255)),
+                ('calculation_id', models.IntegerField()),
+                ('key', models.CharField(max_length=32)),
+                ('content', models.BinaryField()),
+                ('content_type', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('view', 'calculation_id', 'key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='OptimizationCalculation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('optimization_configuration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='optimization_calculation', to='optimization_calculation_plots.optimizationconfiguration')),
+            ],
+        ),
+    ]
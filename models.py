@@ -10,3 +10,19 @@ class OptimizationCalculation(models.Model):
                                                    on_delete=models.CASCADE)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+
+
+class PlotSnapshot(models.Model):
+    """
+    Rendered response of plot view for calculation, served instead of computing plots (see snapshots.py)
+    key - hash of plots configurations with data versions, layout and renderer format of response
+    """
+    view = models.CharField(max_length=255)
+    calculation_id = models.IntegerField()
+    key = models.CharField(max_length=32)
+    content = models.BinaryField()
+    content_type = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('view', 'calculation_id', 'key')
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import numpy as np
+import pandas as pd
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .serializers import get_regular_freq
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class PlotJSONRenderer(JSONRenderer):
+    """
+    JSON renderer for plot views encoding pandas series of datasets directly
+
+    Datasets are expected in form given by RawPlotDataSerializer (data is pandas Series).
+    Datetimes are formatted and NaN values converted to null in bulk, the rest of output is byte-identical
+    with JSONRenderer output of PlotDataSerializer/ColumnarPlotDataSerializer/RegularPlotDataSerializer data,
+    regular time axis is not formatted at all except of its start.
+    Map calculation id -> datasets (batch of calculations) is encoded as JSON object of such lists.
+    Anything else (f.e. error details) is rendered by JSONRenderer.
+    """
+    raw_datasets = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        layout = getattr(renderer_context.get('view'), 'layout', 'points')
+        if self._is_datasets(data):
+            return self.encode_datasets(data, layout).encode()
+        if self._is_calculations_datasets(data):
+            return '{{{}}}'.format(','.join('{}:{}'.format(self.dumps(str(calculation_id)),
+                                                           self.encode_datasets(datasets, layout))
+                                            for calculation_id, datasets in data.items())).encode()
+        return super().render(data, accepted_media_type, renderer_context)
+
+    @staticmethod
+    def _is_datasets(data):
+        return isinstance(data, list) and all(isinstance(dataset, dict) and isinstance(dataset.get('data'), pd.Series)
+                                              for dataset in data)
+
+    @classmethod
+    def _is_calculations_datasets(cls, data):
+        """ map calculation id -> datasets given by batch of calculations """
+        return isinstance(data, dict) and bool(data) and all(
+            isinstance(datasets, list) and cls._is_datasets(datasets) for datasets in data.values())
+
+    def encode_datasets(self, datasets, layout='points'):
+        return '[{}]'.format(','.join(self.encode_dataset(dataset, layout) for dataset in datasets))
+
+    def encode_dataset(self, dataset, layout='points'):
+        series = dataset['data']
+        freq = get_regular_freq(series.index) if layout == 'regular' else None
+        xs = self.encode_index(series.index[:1] if freq is not None else series.index)
+        ys = self.encode_values(series.values)
+        if freq is not None:
+            data = '{{"start":{},"freq":{},"y":[{}]}}'.format(xs[0], self.dumps(freq), ','.join(ys))
+        elif layout in ('columnar', 'regular'):
+            data = '{{"x":[{}],"y":[{}]}}'.format(','.join(xs), ','.join(ys))
+        else:
+            data = '[{}]'.format(','.join(map('{{"x":{},"y":{}}}'.format, xs, ys)))
+        return '{{"label":{},"data":{},"unit":{}}}'.format(self.dumps(dataset['label']), data,
+                                                           self.dumps(dataset['unit']))
+
+    def dumps(self, value):
+        ret = json.dumps(value, cls=self.encoder_class, ensure_ascii=self.ensure_ascii, allow_nan=not self.strict)
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+    def encode_index(self, index):
+        """ datetime index in UTC or without timezone is formatted like DRF JSONEncoder does, at once """
+        if not isinstance(index, pd.DatetimeIndex) or (index.tz is not None and str(index.tz) != 'UTC') \
+                or index.nanosecond.any():
+            return [self.dumps(value) for value in index.tolist()]
+        values = (index.tz_localize(None) if index.tz is not None else index).values
+        suffix = 'Z"' if index.tz is not None else '"'
+        strings = np.datetime_as_string(values, unit='s')
+        with_fraction = index.microsecond != 0
+        if with_fraction.any():
+            strings = np.where(with_fraction, np.datetime_as_string(values, unit='us'), strings)
+        return ['"' + string + suffix for string in strings.tolist()]
+
+    def encode_values(self, values):
+        """ NaN (and infinite) values are converted to null """
+        if values.dtype.kind in 'iu':
+            return list(map(str, values.tolist()))
+        if values.dtype.kind == 'b':
+            return np.where(values, 'true', 'false').tolist()
+        if values.dtype.kind == 'f':
+            strings = np.array(list(map(float.__repr__, values.tolist())), dtype=object)
+            strings[~np.isfinite(values)] = 'null'
+            return strings.tolist()
+        return ['null' if pd.isna(value) else self.dumps(value) for value in values.tolist()]
+
+
+def get_dataset_arrays(series):
+    """
+    x and y numpy arrays of dataset series, datetimes as datetime64[ns] in UTC (without timezone),
+    y as float64 (missing values are NaN)
+    """
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex):
+        x = (index.tz_convert('UTC').tz_localize(None) if index.tz is not None else index).values
+    elif index.dtype.kind in 'iufb':
+        x = index.values
+    else:
+        x = index.astype(str).values.astype(str)
+    return x, series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class BinaryPlotRenderer(BaseRenderer):
+    """
+    Base of renderers encoding pandas series of datasets (RawPlotDataSerializer data) into binary columnar format,
+    datasets of map calculation id -> datasets (batch of calculations) are encoded one after another
+    with calculation id of each dataset, anything else (f.e. error details) is rendered by JSONRenderer
+    with JSON content type
+    """
+    raw_datasets = True
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if PlotJSONRenderer._is_datasets(data):
+            return self.encode_datasets(data)
+        if PlotJSONRenderer._is_calculations_datasets(data):
+            return self.encode_datasets([dataset for datasets in data.values() for dataset in datasets],
+                                        [calculation_id for calculation_id, datasets in data.items()
+                                         for _ in datasets])
+        response = renderer_context.get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data, renderer_context=renderer_context)
+
+    def encode_datasets(self, datasets, calculations=None):
+        """ calculations - calculation id of each dataset for batch of calculations """
+        raise NotImplementedError
+
+
+class NpzPlotRenderer(BinaryPlotRenderer):
+    """
+    NumPy npz archive (numpy.load), arrays x_<n> (datetime64[ns] UTC) and y_<n> (float64) foreach dataset n,
+    labels and units - string arrays with label and unit of each dataset,
+    calculations - calculation id of each dataset (only for batch of calculations)
+    """
+    media_type = 'application/x-npz'
+    format = 'npz'
+    compressed = False
+
+    def encode_datasets(self, datasets, calculations=None):
+        arrays = {'labels': np.array([dataset['label'] for dataset in datasets], dtype=str),
+                  'units': np.array([dataset['unit'] for dataset in datasets], dtype=str)}
+        if calculations is not None:
+            arrays['calculations'] = np.array(calculations, dtype=np.int64)
+        for position, dataset in enumerate(datasets):
+            arrays['x_{}'.format(position)], arrays['y_{}'.format(position)] = get_dataset_arrays(dataset['data'])
+        content = io.BytesIO()
+        (np.savez_compressed if self.compressed else np.savez)(content, **arrays)
+        return content.getvalue()
+
+
+class ArrowPlotRenderer(BinaryPlotRenderer):
+    """
+    Arrow IPC stream (pyarrow.ipc.open_stream), record batch foreach dataset with columns
+    dataset (position of dataset), x (timestamp in UTC) and y (float64),
+    schema metadata labels and units - JSON lists with label and unit of each dataset, requires pyarrow,
+    x is string column (datetimes in ISO 8601) when datasets mix datetime and other x axes,
+    schema metadata calculations - JSON list with calculation id of each dataset (only for batch of calculations)
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+    def encode_datasets(self, datasets, calculations=None):
+        if pyarrow is None:
+            raise ImproperlyConfigured('ArrowPlotRenderer requires pyarrow')
+        arrays = [get_dataset_arrays(dataset['data']) for dataset in datasets]
+        x_type = self.get_x_type([x for x, _ in arrays])
+        metadata = {'labels': json.dumps([dataset['label'] for dataset in datasets]),
+                    'units': json.dumps([dataset['unit'] for dataset in datasets])}
+        if calculations is not None:
+            metadata['calculations'] = json.dumps(calculations)
+        schema = pyarrow.schema([('dataset', pyarrow.int32()), ('x', x_type), ('y', pyarrow.float64())],
+                                metadata=metadata)
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, schema) as writer:
+            for position, (x, y) in enumerate(arrays):
+                writer.write_batch(pyarrow.record_batch([
+                    pyarrow.array(np.full(len(x), position, dtype=np.int32)),
+                    pyarrow.array(self.encode_x(x, x_type), type=x_type),
+                    pyarrow.array(y),
+                ], schema=schema))
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def get_x_type(xs):
+        """
+        type of x column shared by all datasets, timestamp in UTC for datetime axes,
+        common numeric type for numeric axes, string when datasets mix datetime and other axes
+        """
+        kinds = {x.dtype.kind for x in xs}
+        if not kinds or kinds == {'M'}:
+            return pyarrow.timestamp('ns', tz='UTC')
+        if len(kinds) == 1 or kinds <= set('iufb'):
+            return pyarrow.from_numpy_dtype(np.result_type(*(x.dtype for x in xs)))
+        return pyarrow.string()
+
+    @staticmethod
+    def encode_x(x, x_type):
+        """ x converted to strings for string x column (datetimes in ISO 8601 with Z) """
+        if not pyarrow.types.is_string(x_type) or x.dtype.kind == 'U':
+            return x
+        if x.dtype.kind == 'M':
+            with_fraction = x.astype('datetime64[s]') != x
+            return np.where(with_fraction, np.datetime_as_string(x, timezone='UTC'),
+                            np.datetime_as_string(x, unit='s', timezone='UTC'))
+        return x.astype(str)
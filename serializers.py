@@ -1,7 +1,61 @@
+import numpy as np
+import pandas as pd
 from rest_framework import serializers
 
 
+def get_regular_freq(index):
+    """ step in seconds of datetime index with equal steps, None for irregular index or less than 2 points """
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+        return None
+    steps = np.diff(index.values.astype('datetime64[ns]').view(np.int64))
+    if steps[0] <= 0 or (steps != steps[0]).any():
+        return None
+    seconds = float(steps[0]) / 10 ** 9
+    return int(seconds) if seconds.is_integer() else seconds
+
+
 class PlotDataSerializer(serializers.Serializer):
     label = serializers.CharField(required=True, max_length=100)
     data = serializers.ListField(child=serializers.DictField())
     unit = serializers.CharField(required=True, max_length=100)
+
+
+class ColumnarDataField(serializers.Field):
+    """
+    Parallel x and y arrays, converted in bulk without validating or copying each point
+    """
+
+    def to_representation(self, value):
+        return {'x': value['x'].tolist(), 'y': value['y'].tolist()}
+
+
+class ColumnarPlotDataSerializer(serializers.Serializer):
+    label = serializers.CharField(required=True, max_length=100)
+    data = ColumnarDataField()
+    unit = serializers.CharField(required=True, max_length=100)
+
+
+class RawPlotDataSerializer(serializers.BaseSerializer):
+    """
+    Passes datasets through untouched, pandas series in data are encoded by renderer (f.e. PlotJSONRenderer)
+    """
+
+    def to_representation(self, instance):
+        return {'label': instance.label, 'data': instance.data, 'unit': instance.unit}
+
+
+class RegularDataField(ColumnarDataField):
+    """
+    Regular time axis as start and freq (step in seconds) with y array, irregular axis as parallel x and y arrays
+    """
+
+    def to_representation(self, value):
+        if 'start' not in value:
+            return super().to_representation(value)
+        return {'start': value['start'], 'freq': value['freq'], 'y': value['y'].tolist()}
+
+
+class RegularPlotDataSerializer(serializers.Serializer):
+    label = serializers.CharField(required=True, max_length=100)
+    data = RegularDataField()
+    unit = serializers.CharField(required=True, max_length=100)
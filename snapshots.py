@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Snapshots of plot views responses for finished calculations, served by views with attribute snapshots = True
+
+Call create_snapshots when calculation is finalized and delete_snapshots when its data is rewritten,
+management command plot_snapshots creates them for existing calculations. Unfinished calculations are skipped
+and key of snapshot contains data version of plots, so snapshot of changed data is not served.
+Views are given by argument or by dotted paths in settings.PLOT_SNAPSHOT_VIEWS.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+from CommunicationHubRestApi.models import OptimizationCalculation
+from .base_view import LAYOUTS
+from .models import PlotSnapshot
+
+log = logging.getLogger(__name__)
+
+
+def get_snapshot_views():
+    return [import_string(path) for path in getattr(settings, 'PLOT_SNAPSHOT_VIEWS', [])]
+
+
+def create_snapshots(calculation_id, views=None, layouts=None):
+    """
+    snapshots of views foreach layout (all LAYOUTS by default) of calculation, replaces existing ones,
+    with all layouts older snapshots of view and calculation (f.e. of superseded data version) are deleted
+    """
+    snapshots = []
+    for view_class in get_snapshot_views() if views is None else views:
+        view_snapshots = [snapshot for snapshot in (create_snapshot(view_class, calculation_id, layout)
+                                                    for layout in layouts or LAYOUTS) if snapshot is not None]
+        if layouts is None:
+            PlotSnapshot.objects.filter(view=view_class().view_name, calculation_id=calculation_id).exclude(
+                pk__in=[snapshot.pk for snapshot in view_snapshots]).delete()
+        snapshots.extend(view_snapshots)
+    return snapshots
+
+
+def create_snapshot(view_class, calculation_id, layout):
+    """
+    computes response of view with default renderer,
+    None when calculation is not finished (see is_calculation_finished of view) or response is not successful
+    """
+    try:
+        calculation = view_class.get_optimization_calculation(calculation_id)
+    except OptimizationCalculation.DoesNotExist:
+        log.warning('No snapshot of %s, calculation %s not found', view_class.__name__, calculation_id)
+        return None
+    if not view_class().is_calculation_finished(calculation):
+        log.info('No snapshot of %s for unfinished calculation %s', view_class.__name__, calculation_id)
+        return None
+    request = RequestFactory().get('/', {view_class.layout_query_param: layout, view_class.stream_query_param: '0'})
+    view = view_class.as_view(snapshots=False)
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    response = view(request, calculation_id=calculation_id)
+    if response.status_code != 200:
+        log.warning('No snapshot of %s for calculation %s, status %s', view_class.__name__, calculation_id,
+                    response.status_code)
+        return None
+    response.render()
+    view = response.renderer_context['view']
+    snapshot, _ = PlotSnapshot.objects.update_or_create(
+        view=view.view_name, calculation_id=calculation_id, key=view.get_snapshot_key(),
+        defaults={'content': response.content, 'content_type': response['Content-Type']})
+    return snapshot
+
+
+def delete_snapshots(calculation_id=None):
+    """ deletes snapshots of calculation, all snapshots when calculation_id is None """
+    snapshots = PlotSnapshot.objects.all()
+    if calculation_id is not None:
+        snapshots = snapshots.filter(calculation_id=calculation_id)
+    return snapshots.delete()[0]
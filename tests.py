@@ -2,10 +2,26 @@ from django.test import TestCase
 from .models import OptimizationConfiguration, OptimizationCalculation
 import pandas as pd
 from unittest.mock import patch, Mock, call
+import asyncio
+import io
+import json
+import numpy as np
+from unittest import skipIf
+from io import StringIO
+import threading
 
-from .base_configuration import PlotConfig
-from .base_view import OptimizationCalculationBasedPlotView
+from .base_configuration import PlotConfig, PlotContext
+from .async_view import AsyncOptimizationCalculationBasedPlotView
+from .base_view import LAYOUTS, OptimizationCalculationBasedPlotView, SeriesPandasList
+from .cache import PlotCache, invalidate_calculation
+from .loaders import LOADERS
+from .models import PlotSnapshot
+from .renderers import ArrowPlotRenderer, NpzPlotRenderer, PlotJSONRenderer, pyarrow
+from .snapshots import create_snapshots
+from .serializers import RawPlotDataSerializer, get_regular_freq
 
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIRequestFactory
 from django.utils.dateparse import parse_datetime
 from pytz import utc
@@ -32,17 +48,21 @@ class TestOptimizationPlotEndPoint(TestCase):
         m = Mock()
         m.start_time = parse_datetime(self.time_frame[0])
         m.end_time = parse_datetime(self.time_frame[1])
+        self.optimizaton_configuration = m.optimization_configuration
         self.optimization_calculation = Mock(return_value=m)
-        self.optimizaton_configuration = Mock()
-        self.opt_calc_get = OptimizationCalculation.objects.get
-        self.opt_conf_get = OptimizationConfiguration.objects.get
-        OptimizationCalculation.objects.get = self.optimization_calculation
-        OptimizationConfiguration.objects.get = self.optimizaton_configuration
+        self.opt_calc_select_related = OptimizationCalculation.objects.select_related
+        OptimizationCalculation.objects.select_related = Mock(return_value=Mock(get=self.optimization_calculation))
 
     def tearDown(self):
         OptimizationCalculationBasedPlotView.plots_configs = None
-        OptimizationCalculation.objects.get = self.opt_calc_get
-        OptimizationConfiguration.objects.get = self.opt_conf_get
+        OptimizationCalculationBasedPlotView.plot_cache = None
+        OptimizationCalculationBasedPlotView.max_workers = 1
+        OptimizationCalculationBasedPlotView.batch_queries = True
+        OptimizationCalculationBasedPlotView.conditional_requests = False
+        OptimizationCalculationBasedPlotView.instrumentation = False
+        OptimizationCalculationBasedPlotView.snapshots = False
+        OptimizationCalculationBasedPlotView.finished_attribute = None
+        OptimizationCalculation.objects.select_related = self.opt_calc_select_related
 
     def get_mock_model(self, has_optimization_calculation=True):
         test_model = Mock()
@@ -52,7 +72,7 @@ class TestOptimizationPlotEndPoint(TestCase):
             delattr(test_model, 'optimization_configuration')
         return test_model
 
-    def get_plot_config(self, test_model, time_filter, index=[], values=[], labels={}, unit=''):
+    def get_plot_config(self, test_model, time_filter, index=[], values=[], labels={}, unit='', **kwargs):
         index = index if index else ['source', 'optimization_hour']
         values = values if values else ['pow', ]
         return PlotConfig(
@@ -62,7 +82,8 @@ class TestOptimizationPlotEndPoint(TestCase):
             index=index,
             values=values,
             labels=labels,
-            unit=unit
+            unit=unit,
+            **kwargs
         )
 
     def get_plot_view(self, plot_configs, is_df_multiindex):
@@ -72,9 +93,9 @@ class TestOptimizationPlotEndPoint(TestCase):
         return view
 
     @staticmethod
-    def request_get(view):
+    def request_get(view, data=None, **extra):
         factory = APIRequestFactory()
-        request = factory.get('', format='json')
+        request = factory.get('', data=data, format='json', **extra)
         view2 = view.as_view()
         view2.plots_configs = view.plots_configs
         calculation_id = 2048
@@ -133,13 +154,17 @@ class TestOptimizationPlotEndPoint(TestCase):
 
         response = self.request_get(view)
 
-        self.assertEqual(plot_config.filters['optimization_hour__range'], time_frame, 'time frame filter')
         self.assertEqual(response.status_code, 200)
 
         self.assertEqual(response.data, expected_response_data)
 
+        OptimizationCalculation.objects.select_related.assert_called_once_with('optimization_configuration')
+        self.optimization_calculation.assert_called_once_with(id=2048)
         mock_model.objects.filter().values.assert_called_with('pow', 'source', 'optimization_hour')
-        self.assertEqual(mock_model.objects.filter.call_args_list, [call(**plot_config.filters), call()])
+        expected_filters = {'optimization_hour__range': time_frame,
+                            'optimization_calculation': self.optimization_calculation().id}
+        self.assertEqual(mock_model.objects.filter.call_args_list, [call(**expected_filters), call()])
+        self.assertEqual(plot_config.filters, {}, 'configuration is not changed by request')
 
     @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
     def test_without_time_filter_generate_date_range(self, mock_read_frame):
@@ -159,8 +184,8 @@ class TestOptimizationPlotEndPoint(TestCase):
 
         response = self.request_get(view)
 
-        self.assertNotIn('optimization_hour__range', plot_config_no_time_filter.filters)
-        self.assertEqual(mock_model.objects.filter.call_args_list[0], call(**plot_config_no_time_filter.filters),
+        self.assertEqual(mock_model.objects.filter.call_args_list[0],
+                         call(optimization_configuration=self.optimizaton_configuration.id),
                          'queryset called without time filter')
         mock_model.objects.filter().values.assert_called_with('pow', 'source')
         self.assertEqual(response.data, expected_response_data)
@@ -185,14 +210,15 @@ class TestOptimizationPlotEndPoint(TestCase):
 
         response = self.request_get(view)
 
-        self.assertEqual(plot_config.filters['optimization_hour__range'], (0, len(integer_date_range)),
-                         'time frame filter')
         self.assertEqual(response.status_code, 200)
 
         self.assertEqual(response.data, expected_response_data)
 
         mock_model.objects.filter().values.assert_called_with('pow', 'source', 'optimization_hour')
-        self.assertEqual(mock_model.objects.filter.call_args_list, [call(**plot_config.filters), call()])
+        expected_filters = {'optimization_hour__range': (0, len(integer_date_range)),
+                            'optimization_configuration': self.optimizaton_configuration.id}
+        self.assertEqual(mock_model.objects.filter.call_args_list, [call(**expected_filters), call()],
+                         'time frame filter')
 
 
     @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
@@ -250,3 +276,860 @@ class TestOptimizationPlotEndPoint(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data, expected_response_data)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_columnar_layout(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        sources = ['source1', 'source2']
+        date_range = self.get_date_range(time_frame)
+        values = self.generate_plot_values(sources, date_range)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+
+        expected_response_data = self.get_expected_response_data(values, sources, date_range)
+        for plot_data in expected_response_data:
+            plot_data['data'] = {'x': [point['x'] for point in plot_data['data']],
+                                 'y': [point['y'] for point in plot_data['data']]}
+        mock_read_frame.return_value = pd.DataFrame(data=self.get_queryset_data(date_range))
+
+        plot_config = self.get_plot_config(self.get_mock_model(), time_filter=time_filter)
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+
+        response = self.request_get(view, {'layout': 'columnar'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, expected_response_data)
+
+    def test_unknown_layout(self):
+        view = self.get_plot_view([], is_df_multiindex=True)
+
+        response = self.request_get(view, {'layout': 'unknown'})
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_plot_json_renderer_byte_identical(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+        queryset_data = self.get_queryset_data(date_range)
+        queryset_data['temp'] = [value / 3 for value in queryset_data['pow']]
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=queryset_data)
+
+        plot_config = self.get_plot_config(self.get_mock_model(), time_filter=time_filter, values=['pow', 'temp'],
+                                           labels={'source1': 'źródło'}, unit='t/h')
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        fast_view = type('FastView', (view,), {'renderer_classes': [PlotJSONRenderer]})
+
+        for layout in ('points', 'columnar', 'regular'):
+            response = self.request_get(view, {'layout': layout}).render()
+            fast_response = self.request_get(fast_view, {'layout': layout}).render()
+
+            self.assertEqual(fast_response.status_code, 200)
+            self.assertEqual(fast_response.content, response.content, layout)
+
+    def test_plot_json_renderer_bulk_conversion(self):
+        index = pd.DatetimeIndex(['2018-01-03 11:00:00', '2018-01-03 12:00:00.250'])
+        data = [
+            {'label': 'naive', 'data': pd.Series([1.5, float('nan')], index=index), 'unit': ''},
+            {'label': 'utc', 'data': pd.Series([True, False], index=index.tz_localize(utc)), 'unit': ''},
+        ]
+
+        content = PlotJSONRenderer().render(data)
+
+        self.assertEqual(content, JSONRenderer().render([
+            {'label': 'naive', 'data': [{'x': index[0], 'y': 1.5}, {'x': index[1], 'y': None}], 'unit': ''},
+            {'label': 'utc', 'data': [{'x': index.tz_localize(utc)[0], 'y': True},
+                                      {'x': index.tz_localize(utc)[1], 'y': False}], 'unit': ''},
+        ]))
+
+    def test_plot_renderers_error_list(self):
+        errors = ['Invalid value.', 'Another error.']
+
+        self.assertEqual(PlotJSONRenderer().render(errors), JSONRenderer().render(errors))
+        self.assertEqual(NpzPlotRenderer().render(errors), JSONRenderer().render(errors))
+
+    def get_binary_view(self, mock_read_frame, date_range):
+        queryset_data = self.get_queryset_data(date_range)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=queryset_data)
+        plot_config = self.get_plot_config(self.get_mock_model(), ['optimization_hour__range',
+                                                                   PlotConfig.opt_calc_filter_range],
+                                           labels={'source1': 'źródło'}, unit='t/h')
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        datasets = json.loads(self.request_get(view, {'layout': 'columnar'}).render().content)
+        return type('BinaryView', (view,), {
+            'renderer_classes': [PlotJSONRenderer, NpzPlotRenderer, ArrowPlotRenderer]}), datasets
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_npz_renderer(self, mock_read_frame):
+        date_range = self.get_date_range(tuple(parse_datetime(time) for time in self.time_frame))
+        binary_view, datasets = self.get_binary_view(mock_read_frame, date_range)
+        x = date_range.tz_localize(None).values
+
+        npz_response = self.request_get(binary_view, {'format': 'npz', 'stream': '1'}).render()
+        arrays = np.load(io.BytesIO(npz_response.content))
+
+        self.assertEqual(npz_response['Content-Type'], 'application/x-npz')
+        self.assertEqual(arrays['labels'].tolist(), [dataset['label'] for dataset in datasets])
+        self.assertEqual(arrays['units'].tolist(), ['t/h', 't/h'])
+        for position, dataset in enumerate(datasets):
+            np.testing.assert_array_equal(arrays['x_{}'.format(position)], x)
+            self.assertEqual(arrays['y_{}'.format(position)].dtype, np.float64)
+            self.assertEqual(arrays['y_{}'.format(position)].tolist(), dataset['data']['y'])
+
+        response = {}
+        content = NpzPlotRenderer().render({'detail': 'Not found.'}, renderer_context={'response': response})
+        self.assertEqual(json.loads(content), {'detail': 'Not found.'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    @skipIf(pyarrow is None, 'pyarrow is not installed')
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_arrow_renderer(self, mock_read_frame):
+        date_range = self.get_date_range(tuple(parse_datetime(time) for time in self.time_frame))
+        binary_view, datasets = self.get_binary_view(mock_read_frame, date_range)
+
+        arrow_response = self.request_get(binary_view, HTTP_ACCEPT='application/vnd.apache.arrow.stream').render()
+        table = pyarrow.ipc.open_stream(arrow_response.content).read_all()
+
+        self.assertEqual(arrow_response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        self.assertEqual(json.loads(table.schema.metadata[b'labels']), [dataset['label'] for dataset in datasets])
+        self.assertEqual(json.loads(table.schema.metadata[b'units']), ['t/h', 't/h'])
+        self.assertEqual(str(table.schema.field('x').type), 'timestamp[ns, tz=UTC]')
+        frame = table.to_pandas()
+        for position, dataset in enumerate(datasets):
+            rows = frame[frame['dataset'] == position]
+            self.assertEqual(rows['x'].tolist(), date_range.tolist())
+            self.assertEqual(rows['y'].tolist(), dataset['data']['y'])
+
+        mixed_datasets = [{'label': 'time', 'data': pd.Series([1.0, 2.0], index=date_range[:2]), 'unit': ''},
+                          {'label': 'source', 'data': pd.Series([3.0], index=pd.Index([7])), 'unit': ''}]
+        table = pyarrow.ipc.open_stream(ArrowPlotRenderer().render(mixed_datasets)).read_all()
+        self.assertEqual(table.column('x').to_pylist(), ['2018-01-03T11:00:00Z', '2018-01-03T12:00:00Z', '7'])
+        mixed_datasets[0]['data'] = pd.Series([1.0], index=pd.Index([0.5]))
+        table = pyarrow.ipc.open_stream(ArrowPlotRenderer().render(mixed_datasets)).read_all()
+        self.assertEqual(table.column('x').to_pylist(), [0.5, 7.0])
+
+    def test_regular_layout(self):
+        index = pd.date_range(start='2018-01-03 11:00:00', periods=4, freq=self.TIME_FREQUENCE, tz=utc)
+        irregular_index = index.delete(2)
+        pd_list = LAYOUTS['regular'][0]()
+        series_list = SeriesPandasList()
+        for data in (pd.Series([1.5, 2.0, 3.0, 4.0], index=index, name='pow'),
+                     pd.Series([1, 2, 3], index=irregular_index, name='pow'),
+                     pd.Series([1], index=index[:1], name='pow'),
+                     pd.Series([1.0, 2.0], index=pd.date_range(start=index[0], periods=2, freq='90s'), name='pow')):
+            pd_list.add_ds(data)
+            series_list.add_ds(data)
+
+        data = LAYOUTS['regular'][1](pd_list, many=True).data
+        content = PlotJSONRenderer().render(RawPlotDataSerializer(series_list, many=True).data,
+                                            renderer_context={'view': Mock(layout='regular')})
+
+        self.assertEqual(data[0]['data'], {'start': index[0], 'freq': 3600, 'y': [1.5, 2.0, 3.0, 4.0]})
+        self.assertEqual(data[1]['data'], {'x': irregular_index.tolist(), 'y': [1, 2, 3]})
+        self.assertEqual(data[2]['data'], {'x': index[:1].tolist(), 'y': [1]})
+        self.assertEqual(data[3]['data']['freq'], 90)
+        self.assertEqual(content, JSONRenderer().render(data))
+        if hasattr(index, 'as_unit'):
+            self.assertEqual(get_regular_freq(index.as_unit('us')), 3600)
+            self.assertEqual(get_regular_freq(index.as_unit('s')), 3600)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_streaming(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+        queryset_data = self.get_queryset_data(date_range)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=queryset_data)
+
+        plot_config = self.get_plot_config(self.get_mock_model(), time_filter=time_filter)
+        plot_config2 = self.get_plot_config(self.get_mock_model(), time_filter=time_filter, unit='t/h')
+        view = self.get_plot_view([plot_config, plot_config2], is_df_multiindex=True)
+
+        for layout in ('points', 'columnar', 'regular'):
+            response = self.request_get(view, {'layout': layout}).render()
+            stream_response = self.request_get(view, {'layout': layout, 'stream': '1'})
+
+            self.assertTrue(stream_response.streaming)
+            self.assertEqual(stream_response['Content-Type'], 'application/json')
+            self.assertEqual(b''.join(stream_response.streaming_content), response.content, layout)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_plot_cache(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+        queryset_data = self.get_queryset_data(date_range)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=queryset_data)
+
+        plot_config = self.get_plot_config(self.get_mock_model(), time_filter=time_filter)
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        view.plot_cache = PlotCache()
+        calculation_id = self.optimization_calculation.return_value.id
+
+        response = self.request_get(view)
+        cached_response = self.request_get(view)
+        columnar_response = self.request_get(view, {'layout': 'columnar'})
+        invalidate_calculation(calculation_id)
+        invalidated_response = self.request_get(view)
+
+        self.assertEqual(mock_read_frame.call_count, 3)
+        self.assertEqual(view.plot_cache.stats, {'hits': 1, 'misses': 3, 'size': 1})
+        self.assertEqual(cached_response.data, response.data)
+        self.assertEqual(invalidated_response.data, response.data)
+        self.assertNotEqual(columnar_response.data, response.data)
+
+        first_time, last_time = lambda start, end: start, lambda start, end: end
+        fingerprints = {self.get_plot_config(view.plots_configs[0]._model, ['optimization_hour__lte', get_time])
+                        .fingerprint for get_time in (first_time, last_time)}
+        self.assertEqual(len(fingerprints), 2, 'lambdas in same scope are distinguished')
+
+    def test_plot_cache_eviction_and_timeout(self):
+        plot_cache = PlotCache(timeout=60, max_entries=2)
+        for calculation_id in range(3):
+            plot_cache.set(('view', calculation_id), [calculation_id], calculation_id)
+
+        self.assertIsNone(plot_cache.get(('view', 0)))
+        self.assertEqual(plot_cache.get(('view', 2)), [2])
+
+        with patch('optimization_calculation_plots.cache.time.monotonic', return_value=float('inf')):
+            self.assertIsNone(plot_cache.get(('view', 2)))
+        self.assertEqual(len(plot_cache), 1)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_max_points_downsampling(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        sources = ['source1', 'source2']
+        date_range = self.get_date_range(time_frame)
+        values = self.generate_plot_values(sources, date_range)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+        queryset_data = self.get_queryset_data(date_range)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=queryset_data)
+
+        expected_response_data = self.get_expected_response_data(values, sources, date_range)
+        expected_response_data += self.get_expected_response_data(values, sources, date_range)
+        for plot_data in expected_response_data[:2]:
+            plot_data['data'] = [plot_data['data'][i] for i in (0, 1, 4)]
+        for plot_data in expected_response_data[2:]:
+            plot_data['data'] = [plot_data['data'][i] for i in (0, 2, 3, 4)]
+
+        plot_config = self.get_plot_config(self.get_mock_model(), time_filter=time_filter, downsample='lttb')
+        plot_config2 = self.get_plot_config(self.get_mock_model(), time_filter=time_filter, downsample='minmax')
+        view = self.get_plot_view([plot_config, plot_config2], is_df_multiindex=True)
+
+        response = self.request_get(view, {'max_points': 4})
+        lttb_response = self.request_get(view, {'max_points': 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[2:], expected_response_data[2:])
+        self.assertEqual(lttb_response.data[:2], expected_response_data[:2])
+        self.assertEqual(self.request_get(view, {'max_points': 'all'}).status_code, 400)
+
+    def test_generate_date_range_matches_previous_implementation(self):
+        def previous_generate_date_range(plot_config, df):
+            df.set_index(plot_config.index, inplace=True)
+            start_time = context.optimization_calculation.start_time
+            end_time = context.optimization_calculation.end_time
+            rng = pd.date_range(start=start_time, end=end_time, freq=plot_config.TIME_FREQUENCE).to_pydatetime()
+            date_range = pd.DataFrame(columns=plot_config.values, index=pd.MultiIndex.from_product([df.index, rng]))
+            for index in df.index:
+                date_range.loc[index] = df.loc[index].iloc[0]
+            return date_range
+
+        sources = ['source{}'.format(i) for i in range(20)]
+        df = pd.DataFrame(data={'source': sources, 'pow': [i * 1.5 for i in range(len(sources))]})
+        plot_config = self.get_plot_config(self.get_mock_model(has_optimization_calculation=False), time_filter=[],
+                                           index=['source', ])
+        context = PlotContext.for_calculation(self.optimization_calculation())
+
+        date_range = plot_config._generate_date_range(df.copy(), context)
+
+        pd.testing.assert_frame_equal(date_range, previous_generate_date_range(plot_config, df.copy()),
+                                      check_dtype=False)
+        self.assertEqual(date_range['pow'].dtype, df['pow'].dtype)
+
+    def test_convert_integer_time_series_to_datetime_dtype(self):
+        df = pd.DataFrame(data={'source': ['source1'] * 3, 'optimization_hour': [0, 1, 25], 'pow': [1, 2, 3]})
+        plot_config = self.get_plot_config(self.get_mock_model(), ['optimization_hour__range',
+                                                                   PlotConfig.opt_calc_filter_delta])
+        context = PlotContext.for_calculation(self.optimization_calculation())
+
+        plot_config._convert_integer_time_series_to_datetime(df, context)
+
+        start_time = parse_datetime(self.time_frame[0])
+        self.assertEqual(str(df['optimization_hour'].dtype), 'datetime64[ns, UTC]')
+        self.assertEqual(df['optimization_hour'].tolist(),
+                         [start_time + pd.Timedelta(hours=hour) for hour in (0, 1, 25)])
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_deprecated_class_level_calculation(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(
+            self.get_date_range(time_frame)))
+        plot_config = self.get_plot_config(self.get_mock_model(), ['optimization_hour__range',
+                                                                   PlotConfig.opt_calc_filter_range])
+        context = PlotContext.for_calculation(self.optimization_calculation())
+        try:
+            with self.assertWarns(DeprecationWarning):
+                PlotConfig.set_optimization_calc_conf(self.optimization_calculation(), self.optimizaton_configuration)
+            with self.assertWarns(DeprecationWarning):
+                df = plot_config.df
+            with self.assertWarns(DeprecationWarning):
+                plot_config.queryset
+        finally:
+            PlotConfig.optimization_calculation = PlotConfig.optimization_configuration = None
+
+        pd.testing.assert_frame_equal(df, plot_config.get_df(context))
+        self.assertEqual(plot_config.filters, {}, 'configuration is not changed by deprecated API')
+
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        response = self.request_get(view)
+        injected = df.assign(pow=df['pow'] * 10)
+        with self.assertWarns(DeprecationWarning):
+            plot_config.df = injected
+        mock_read_frame.reset_mock()
+        injected_response = self.request_get(view)
+        with self.assertWarns(DeprecationWarning):
+            del plot_config.df
+
+        mock_read_frame.assert_not_called()
+        self.assertEqual([point['y'] for point in injected_response.data[0]['data']],
+                         [point['y'] * 10 for point in response.data[0]['data']])
+
+    def test_columnar_loaders(self):
+        configuration = OptimizationConfiguration.objects.create(name='loader')
+        time_frame = self.get_date_range([parse_datetime(time) for time in self.time_frame])
+        for start_time in time_frame:
+            OptimizationCalculation.objects.create(optimization_configuration=configuration, start_time=start_time,
+                                                   end_time=start_time + pd.Timedelta(hours=1))
+        fields = ['start_time', 'id', 'optimization_configuration']
+        queryset = OptimizationCalculation.objects.values(*fields).order_by('id')
+
+        for loader, read_frame in LOADERS.items():
+            df = read_frame(queryset, fields)
+
+            self.assertEqual(list(df.columns), fields, loader)
+            self.assertEqual(str(df['start_time'].dtype), 'datetime64[ns, UTC]', loader)
+            self.assertEqual(df['id'].dtype, 'int64', loader)
+            self.assertEqual(df['start_time'].tolist(), time_frame.tolist(), loader)
+            self.assertEqual(df['optimization_configuration'].tolist(), [configuration.id] * len(time_frame), loader)
+            self.assertTrue(read_frame(queryset.none(), fields).empty, loader)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_concurrent_plots_configs(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(date_range))
+
+        plots_configs = [self.get_plot_config(self.get_mock_model(), time_filter=time_filter, unit=str(unit))
+                         for unit in range(4)]
+        view = self.get_plot_view(plots_configs, is_df_multiindex=True)
+        response = self.request_get(view)
+
+        barrier = threading.Barrier(4, timeout=5)
+
+        def read_frame(queryset):
+            barrier.wait()
+            return pd.DataFrame(data=self.get_queryset_data(date_range))
+        mock_read_frame.side_effect = read_frame
+        view.max_workers = 4
+        concurrent_response = self.request_get(view)
+
+        self.assertEqual(concurrent_response.status_code, 200)
+        self.assertEqual(concurrent_response.data, response.data)
+        self.assertEqual([plot_data['unit'] for plot_data in concurrent_response.data],
+                         ['0', '0', '1', '1', '2', '2', '3', '3'])
+
+        lock = threading.Lock()
+        reads = {'active': 0, 'peak': 0}
+
+        def counted_read_frame(queryset):
+            with lock:
+                reads['active'] += 1
+                reads['peak'] = max(reads['peak'], reads['active'])
+            threading.Event().wait(0.02)
+            with lock:
+                reads['active'] -= 1
+            return pd.DataFrame(data=self.get_queryset_data(date_range))
+        mock_read_frame.side_effect = counted_read_frame
+        view.max_workers = 2
+        bounded_response = self.request_get(view)
+
+        self.assertEqual(bounded_response.data, response.data)
+        self.assertEqual(reads['peak'], 2, 'at most max_workers batches are built at once')
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_batch_queries_of_same_model(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+        queryset_data = self.get_queryset_data(date_range)
+        queryset_data['temp'] = [value * 10 for value in queryset_data['pow']]
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=queryset_data)
+
+        mock_model = self.get_mock_model()
+        plot_config = self.get_plot_config(mock_model, time_filter=time_filter, values=['pow', ])
+        plot_config2 = self.get_plot_config(mock_model, time_filter=time_filter, values=['temp', ], unit='C')
+        other_plot_config = self.get_plot_config(self.get_mock_model(), time_filter=time_filter)
+        view = self.get_plot_view([plot_config, other_plot_config, plot_config2], is_df_multiindex=True)
+
+        view.batch_queries = False
+        response = self.request_get(view)
+        self.assertEqual(mock_read_frame.call_count, 3)
+
+        mock_read_frame.reset_mock()
+        mock_model.reset_mock()
+        view.batch_queries = True
+        batch_response = self.request_get(view)
+
+        self.assertEqual(mock_read_frame.call_count, 2)
+        mock_model.objects.filter.assert_called_once()
+        mock_model.objects.filter().values.assert_called_once_with('pow', 'source', 'optimization_hour', 'temp')
+        self.assertEqual(batch_response.data, response.data)
+        self.assertEqual([plot_data['label'] for plot_data in batch_response.data],
+                         ['source1 pow', 'source2 pow', 'source1 pow', 'source2 pow', 'source1 temp', 'source2 temp'])
+
+    def test_iter_groups_series_sorted_split_matches_groupby(self):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        df = pd.DataFrame(data=self.get_queryset_data(date_range, sources=['b', 'c', 'a']))
+        df['temp'] = df['pow'] / 2
+        view = OptimizationCalculationBasedPlotView()
+
+        for frame in (df.sort_values(['source', 'optimization_hour']), df):
+            frame = frame.set_index(['source', 'optimization_hour'])
+            expected = [(source_name, {value: group.droplevel(0).loc[:, value] for value in ('pow', 'temp')})
+                        for source_name, group in frame.groupby(level=0)]
+
+            with patch.object(view, 'group_df_by_index', wraps=view.group_df_by_index) as group_df_by_index:
+                groups = list(view.iter_groups_series(frame, ['pow', 'temp']))
+
+            self.assertEqual(group_df_by_index.called, not frame.index.is_monotonic_increasing)
+            self.assertEqual([source_name for source_name, _ in groups], ['a', 'b', 'c'])
+            for (source_name, series), (_, expected_series) in zip(groups, expected):
+                for value in ('pow', 'temp'):
+                    pd.testing.assert_series_equal(series[value], expected_series[value])
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_since_narrows_time_filter(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        mock_model = self.get_mock_model()
+        plot_config = self.get_plot_config(mock_model, ['optimization_hour__range', PlotConfig.opt_calc_filter_range])
+        integer_model = self.get_mock_model()
+        integer_model._meta.get_field().get_internal_type.return_value = 'IntegerField'
+        integer_queryset = integer_model.objects.filter().values().order_by()
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(
+            list(range(3, len(date_range))) if queryset is integer_queryset else date_range[3:]))
+        integer_plot_config = self.get_plot_config(integer_model, ['optimization_hour__range',
+                                                                   PlotConfig.opt_calc_filter_delta])
+        view = self.get_plot_view([plot_config, integer_plot_config], is_df_multiindex=True)
+
+        response = self.request_get(view, {'since': '2'})
+        datetime_response = self.request_get(view, {'since': '2018-01-03T13:00:00Z'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(datetime_response.data, response.data)
+        self.assertEqual(mock_model.objects.filter.call_args[1]['optimization_hour__range'],
+                         (date_range[2] + pd.Timedelta(microseconds=1), time_frame[1]))
+        self.assertEqual(integer_model.objects.filter.call_args[1]['optimization_hour__range'],
+                         (3, len(date_range)))
+        self.assertEqual(self.request_get(view, {'since': 'yesterday'}).status_code, 400)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_aware_time_params_without_time_zone_support(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time).replace(tzinfo=None) for time in self.time_frame)
+        calculation = self.optimization_calculation()
+        calculation.start_time, calculation.end_time = time_frame
+        date_range = self.get_date_range(time_frame)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(date_range[3:]))
+        mock_model = self.get_mock_model()
+        plot_config = self.get_plot_config(mock_model, ['optimization_hour__range', PlotConfig.opt_calc_filter_range])
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+
+        with self.settings(USE_TZ=False, TIME_ZONE='Europe/Warsaw'):
+            response = self.request_get(view, {'since': '2018-01-03T12:00:00Z', 'to': '2018-01-03T14:00:00+01:00'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_model.objects.filter.call_args[1]['optimization_hour__range'],
+                         (date_range[2] + pd.Timedelta(microseconds=1), date_range[3]))
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_since_with_generated_date_range(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        mock_read_frame.return_value = pd.DataFrame(data={'source': ['source1'], 'pow': [123]})
+        expected_response_data = self.get_expected_response_data([123] * 2, ['source1'], date_range[3:])
+
+        plot_config = self.get_plot_config(self.get_mock_model(has_optimization_calculation=False), time_filter=[],
+                                           index=['source', ])
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+
+        response = self.request_get(view, {'since': '2'})
+
+        self.assertEqual(response.data, expected_response_data)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_conditional_requests(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(date_range))
+
+        mock_model = self.get_mock_model()
+        mock_model.objects.filter().aggregate.return_value = {'count': 10, 'last_time': time_frame[1]}
+        plot_config = self.get_plot_config(mock_model, ['optimization_hour__range', PlotConfig.opt_calc_filter_range])
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        view.conditional_requests = True
+
+        response = self.request_get(view)
+        not_modified_response = self.request_get(view, HTTP_IF_NONE_MATCH=response['ETag'])
+        since_response = self.request_get(view, {'since': '2'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        mock_model.objects.filter().aggregate.return_value = {'count': 12, 'last_time': time_frame[1]}
+        modified_response = self.request_get(view, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response['ETag'], response['ETag'])
+        self.assertEqual(since_response.status_code, 200)
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response['ETag'], response['ETag'])
+        self.assertEqual(mock_read_frame.call_count, 3)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_async_view_same_output(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        time_filter = ['optimization_hour__range', PlotConfig.opt_calc_filter_range]
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(date_range))
+
+        plots_configs = [self.get_plot_config(self.get_mock_model(), time_filter=time_filter, unit=str(unit))
+                         for unit in range(3)]
+        view = self.get_plot_view(plots_configs, is_df_multiindex=True)
+        async_view = AsyncOptimizationCalculationBasedPlotView.as_view()
+
+        for data in (None, {'layout': 'columnar'}, {'layout': 'unknown'}):
+            request = APIRequestFactory().get('', data=data, format='json')
+            async_response = asyncio.run(async_view(request, calculation_id=2048))
+            response = self.request_get(view, data)
+
+            self.assertTrue(asyncio.iscoroutinefunction(async_view))
+            self.assertEqual(async_response.status_code, response.status_code)
+            if response.status_code == 200:
+                self.assertEqual(async_response.render().content, response.render().content)
+        post_response = asyncio.run(async_view(APIRequestFactory().post(''), calculation_id=2048))
+        self.assertEqual(post_response.status_code, 405)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_batch_of_calculations(self, mock_read_frame):
+        sources = ['source1', 'source2']
+        calculations = {}
+        for calculation_id, time_frame in ((1, self.time_frame), (2, ('2018-01-03 12:00:00', '2018-01-03 16:00:00'))):
+            calculation = Mock(id=calculation_id)
+            calculation.start_time, calculation.end_time = (parse_datetime(time) for time in time_frame)
+            calculations[calculation_id] = calculation
+        union_range = self.get_date_range((calculations[1].start_time, calculations[2].end_time))
+        frames = []
+        for calculation_id, calculation in calculations.items():
+            frame = pd.DataFrame(data=self.get_queryset_data(union_range, sources))
+            frame['pow'] += calculation_id * 100
+            frame['calculation_key'] = calculation_id
+            frames.append(frame)
+        mock_read_frame.return_value = pd.concat(frames, ignore_index=True)
+        OptimizationCalculation.objects.select_related.return_value.filter.return_value = list(calculations.values())
+
+        mock_model = self.get_mock_model()
+        plot_config = self.get_plot_config(mock_model, ['optimization_hour__range', PlotConfig.opt_calc_filter_range])
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        request = APIRequestFactory().get('', data={'calculation_ids': '2,1'})
+        response = view.as_view(batch=True)(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), [2, 1])
+        mock_read_frame.assert_called_once()
+        OptimizationCalculation.objects.select_related().filter.assert_called_once_with(id__in=[2, 1])
+        mock_model.objects.filter.assert_called_once_with(
+            optimization_hour__range=(calculations[1].start_time, calculations[2].end_time),
+            optimization_calculation__in=[1, 2])
+        for calculation_id, calculation in calculations.items():
+            date_range = self.get_date_range((calculation.start_time, calculation.end_time))
+            values = [value + calculation_id * 100 for value, time in zip(
+                self.generate_plot_values(sources, union_range), union_range.tolist() * len(sources))
+                if time in date_range]
+            self.assertEqual(response.data[calculation_id],
+                             self.get_expected_response_data(values, sources, date_range))
+
+        async_view = AsyncOptimizationCalculationBasedPlotView.as_view(batch=True)
+        async_response = asyncio.run(async_view(APIRequestFactory().get('', data={'calculation_ids': '2,1'})))
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.data, response.data)
+
+        missing_response = view.as_view(batch=True)(APIRequestFactory().get('', data={'calculation_ids': '1,3'}))
+        self.assertEqual(missing_response.status_code, 404)
+        invalid_response = view.as_view(batch=True)(APIRequestFactory().get('', data={'calculation_ids': 'a'}))
+        self.assertEqual(invalid_response.status_code, 400)
+        for param in ('since', 'from', 'to', 'page_hours'):
+            unsupported_response = view.as_view(batch=True)(APIRequestFactory().get(
+                '', data={'calculation_ids': '1,2', param: '2'}))
+            self.assertEqual(unsupported_response.status_code, 400, param)
+
+        mock_model.__name__ = 'Power'
+        view.instrumentation = True
+        timed_response = view.as_view(batch=True)(APIRequestFactory().get('', data={'calculation_ids': '2,1'}))
+        self.assertEqual(timed_response.data, response.data)
+        self.assertIn('query;dur=', timed_response['Server-Timing'])
+
+        scalar_model = self.get_mock_model()
+        scalar_model.__name__ = 'ScalarPower'
+        scalar_model.objects.filter().values().order_by().model = scalar_model
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(union_range, sources)) \
+            if queryset.model is scalar_model else pd.concat(frames, ignore_index=True)
+        scalar_view = type('ScalarBatchView', (view,), {'plots_configs': [self.get_plot_config(
+            scalar_model, ['optimization_hour__lte', lambda start_time, end_time: end_time])]})
+        scalar_response = scalar_view.as_view(batch=True)(APIRequestFactory().get('', data={'calculation_ids': '2,1'}))
+        self.assertEqual(scalar_response.status_code, 200)
+        self.assertEqual(list(scalar_response.data), [2, 1])
+        self.assertEqual([filters[1]['optimization_hour__lte'] for filters in scalar_model.objects.filter.call_args_list
+                          if filters[1]], [calculations[2].end_time, calculations[1].end_time])
+        mock_read_frame.side_effect = None
+
+        frames[0].loc[0, 'pow'] = np.nan
+        mock_read_frame.return_value = pd.concat(frames, ignore_index=True)
+        raw_view = type('RawBatchView', (view,), {
+            'renderer_classes': [PlotJSONRenderer, NpzPlotRenderer, ArrowPlotRenderer]}).as_view(batch=True)
+        json_response = raw_view(APIRequestFactory().get('', data={'calculation_ids': '2,1'})).render()
+        npz_response = raw_view(APIRequestFactory().get('', data={'calculation_ids': '2,1', 'format': 'npz'})).render()
+
+        expected = json.loads(JSONRenderer().render(response.data))
+        expected['1'][0]['data'][0]['y'] = None
+        self.assertEqual(json_response.status_code, 200)
+        self.assertEqual(json.loads(json_response.content), expected)
+        labels = [dataset['label'] for datasets in expected.values() for dataset in datasets]
+        self.assertEqual(npz_response['Content-Type'], 'application/x-npz')
+        arrays = np.load(io.BytesIO(npz_response.content))
+        self.assertEqual(arrays['calculations'].tolist(), [2, 2, 1, 1])
+        self.assertEqual(arrays['labels'].tolist(), labels)
+        self.assertTrue(np.isnan(arrays['y_2'][0]))
+        if pyarrow is not None:
+            arrow_response = raw_view(APIRequestFactory().get('', data={'calculation_ids': '2,1',
+                                                                        'format': 'arrow'})).render()
+            self.assertEqual(arrow_response['Content-Type'], 'application/vnd.apache.arrow.stream')
+            table = pyarrow.ipc.open_stream(arrow_response.content).read_all()
+            self.assertEqual(json.loads(table.schema.metadata[b'calculations']), [2, 2, 1, 1])
+            self.assertEqual(json.loads(table.schema.metadata[b'labels']), labels)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_time_frame_and_pages(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        mock_model = self.get_mock_model()
+        plot_config = self.get_plot_config(mock_model, ['optimization_hour__range', PlotConfig.opt_calc_filter_range])
+        integer_model = self.get_mock_model()
+        integer_model._meta.get_field().get_internal_type.return_value = 'IntegerField'
+        integer_plot_config = self.get_plot_config(integer_model, ['optimization_hour__range',
+                                                                   PlotConfig.opt_calc_filter_delta])
+        generated_plot_config = self.get_plot_config(self.get_mock_model(has_optimization_calculation=False),
+                                                     time_filter=[], index=['source', ])
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data={'source': ['source1'], 'pow': [1]}) \
+            if queryset.model is not mock_model and queryset.model is not integer_model \
+            else pd.DataFrame(data=self.get_queryset_data([], values=[]))
+        for model in (mock_model, integer_model):
+            model.objects.filter().values().order_by().model = model
+        view = self.get_plot_view([plot_config, integer_plot_config, generated_plot_config], is_df_multiindex=True)
+
+        response = self.request_get(view, {'from': '1', 'to': '2018-01-03T14:00:00Z'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Link', response)
+        self.assertEqual(mock_model.objects.filter.call_args[1]['optimization_hour__range'],
+                         (date_range[1], date_range[3]))
+        self.assertEqual(integer_model.objects.filter.call_args[1]['optimization_hour__range'], (1, 3))
+        self.assertEqual([point['x'] for point in response.data[0]['data']], list(date_range[1:4]))
+
+        first_page = self.request_get(view, {'from': '1', 'page_hours': '2'})
+        last_page = self.request_get(view, {'from': '3', 'page_hours': '2'})
+
+        self.assertEqual(first_page['Link'], '<http://testserver/?from={}&page_hours=2>; rel="next"'.format(
+            '2018-01-03T14%3A00%3A00%2B00%3A00'))
+        self.assertNotIn('Link', last_page)
+        self.assertEqual(integer_model.objects.filter.call_args_list[-2][1]['optimization_hour__range'], (1, 2))
+        self.assertEqual(mock_model.objects.filter.call_args_list[-2][1]['optimization_hour__range'],
+                         (date_range[1], date_range[3] - pd.Timedelta(microseconds=1)))
+        self.assertEqual([point['x'] for point in first_page.data[0]['data']], list(date_range[1:3]))
+        self.assertEqual([point['x'] for point in last_page.data[0]['data']], list(date_range[3:]))
+        self.assertEqual(self.request_get(view, {'page_hours': '0'}).status_code, 400)
+        self.assertEqual(self.request_get(view, {'to': 'tomorrow'}).status_code, 400)
+
+        scalar_plot_config = self.get_plot_config(mock_model, ['optimization_hour__lte',
+                                                               lambda start_time, end_time: end_time])
+        context = PlotContext.for_calculation(self.optimization_calculation(), start_time=date_range[1])
+        self.assertEqual(scalar_plot_config.get_time_filter_value(context), time_frame[1],
+                         'value of time function other than range is not narrowed')
+
+    def test_resample_in_database(self):
+        configuration = OptimizationConfiguration.objects.create(name='resample')
+        date_range = pd.date_range(start=parse_datetime(self.time_frame[0]), periods=30, freq=self.TIME_FREQUENCE)
+        ids = [OptimizationCalculation.objects.create(optimization_configuration=configuration, start_time=start_time,
+                                                      end_time=start_time).id for start_time in date_range]
+        calculation = Mock(start_time=date_range[0], end_time=date_range[-1], optimization_configuration=configuration)
+        rows = pd.Series(ids, index=date_range, dtype='int64')
+        expected = {
+            'D': {'sum': rows.groupby(rows.index.floor('D')).sum(), 'max': rows.groupby(rows.index.floor('D')).max(),
+                  'last': rows.groupby(rows.index.floor('D')).last()},
+            'W': {'mean': pd.Series([rows.mean()], index=[pd.Timestamp('2018-01-01', tz=utc)])},
+        }
+
+        for loader in LOADERS:
+            for frequency, aggregations in expected.items():
+                for aggregation, expected_series in aggregations.items():
+                    plot_config = PlotConfig(OptimizationCalculation, {}, ['start_time__range',
+                                                                           PlotConfig.opt_calc_filter_range],
+                                             index=['optimization_configuration', 'start_time'], values=['id'],
+                                             loader=loader, resample='D', aggregation=aggregation)
+                    df = plot_config.get_df(PlotContext.for_calculation(calculation, frequency=frequency))
+
+                    message = (loader, frequency, aggregation)
+                    self.assertEqual(df.index.get_level_values(0).unique().tolist(), [configuration.id], message)
+                    self.assertEqual(df.index.get_level_values(1).tolist(), expected_series.index.tolist(), message)
+                    self.assertEqual(df['id'].tolist(), expected_series.tolist(), message)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_resample_generated_date_range(self, mock_read_frame):
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data={'source': ['source1'], 'pow': [123]})
+        calculation = Mock(start_time=parse_datetime('2018-01-03 11:00:00'),
+                           end_time=parse_datetime('2018-01-05 15:00:00'))
+        plot_config = self.get_plot_config(self.get_mock_model(has_optimization_calculation=False), time_filter=[],
+                                           index=['source', ], resample='D')
+
+        df = plot_config.get_df(PlotContext.for_calculation(calculation))
+
+        self.assertEqual(df.index.get_level_values(1).tolist(),
+                         list(pd.date_range(start='2018-01-03', end='2018-01-05', freq='D', tz=utc)))
+        self.assertEqual(df['pow'].tolist(), [123] * 3)
+
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        self.assertEqual(len(self.request_get(view, {'resample': 'H'}).data[0]['data']), 5)
+        self.assertEqual(self.request_get(view, {'resample': 'M'}).status_code, 400)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_instrumentation(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(date_range))
+        mock_model = self.get_mock_model()
+        mock_model.__name__ = 'PowerModel'
+        plot_config = self.get_plot_config(mock_model, ['optimization_hour__range', PlotConfig.opt_calc_filter_range])
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+
+        self.assertNotIn('Server-Timing', self.request_get(view))
+
+        view.instrumentation = True
+        with patch.object(view, 'export_timings') as export_timings, \
+                self.assertLogs('optimization_calculation_plots.base_view', level='INFO') as logs:
+            response = self.request_get(view)
+
+        self.assertEqual([metric.split(';')[0] for metric in response['Server-Timing'].split(', ')],
+                         ['query', 'transform', 'group', 'serialize', 'render', 'total'])
+        timings = export_timings.call_args[0][0]
+        records = {record.stage: record for record in timings.records}
+        self.assertEqual(records['query'].plot, 'PowerModel')
+        self.assertEqual(records['query'].rows, 2 * len(date_range))
+        self.assertEqual(records['group'].points, 2 * len(date_range))
+        self.assertEqual(logs.records[0].plot_timings, [record.as_dict() for record in timings.records])
+        self.assertEqual(logs.records[0].calculation_id, self.optimization_calculation().id)
+
+    @patch(CONFIGURATIONS_PATH + '.PlotConfig.read_frame')
+    def test_snapshots(self, mock_read_frame):
+        time_frame = tuple(parse_datetime(time) for time in self.time_frame)
+        date_range = self.get_date_range(time_frame)
+        mock_read_frame.side_effect = lambda queryset: pd.DataFrame(data=self.get_queryset_data(date_range))
+        self.optimization_calculation().id = 2048
+        mock_model = self.get_mock_model()
+        mock_model.objects.filter().aggregate.return_value = {'count': 10, 'last_time': time_frame[1]}
+        plot_config = self.get_plot_config(mock_model, ['optimization_hour__range', PlotConfig.opt_calc_filter_range])
+        view = self.get_plot_view([plot_config, ], is_df_multiindex=True)
+        response = self.request_get(view, {'layout': 'columnar'}).render()
+
+        snapshots = create_snapshots(2048, views=[view])
+        view.snapshots = True
+        mock_read_frame.reset_mock()
+        snapshot_response = self.request_get(view, {'layout': 'columnar'})
+
+        self.assertEqual(len(snapshots), len(LAYOUTS))
+        mock_read_frame.assert_not_called()
+        self.assertEqual(snapshot_response.content, response.content)
+        self.assertEqual(snapshot_response['Content-Type'], response['Content-Type'])
+
+        view.conditional_requests = True
+        conditional_response = self.request_get(view, {'layout': 'columnar'})
+        not_modified_response = self.request_get(view, {'layout': 'columnar'},
+                                                 HTTP_IF_NONE_MATCH=conditional_response['ETag'])
+        self.optimization_calculation.side_effect = OptimizationCalculation.DoesNotExist
+        deleted_response = self.request_get(view, {'layout': 'columnar'})
+        self.optimization_calculation.side_effect = None
+        view.conditional_requests = False
+
+        mock_read_frame.assert_not_called()
+        self.assertEqual(conditional_response.content, response.content)
+        self.assertIn('ETag', conditional_response)
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(deleted_response.status_code, 404)
+
+        self.request_get(view, {'layout': 'columnar', 'since': '2'})
+        mock_read_frame.assert_called_once()
+
+        mock_model.objects.filter().aggregate.return_value = {'count': 12, 'last_time': time_frame[1]}
+        self.request_get(view, {'layout': 'columnar'})
+        self.assertEqual(mock_read_frame.call_count, 2, 'snapshot of changed data is not served')
+
+        view.finished_attribute = 'is_finished'
+        self.optimization_calculation().is_finished = False
+        self.assertEqual(create_snapshots(2048, views=[view]), [])
+        view.finished_attribute = None
+
+        changed_model = self.get_mock_model()
+        changed_model.objects.filter().aggregate.return_value = {'count': 10, 'last_time': time_frame[1]}
+        view.plots_configs = [self.get_plot_config(changed_model, ['optimization_hour__range',
+                                                                   PlotConfig.opt_calc_filter_range], unit='W')]
+        self.request_get(view)
+        self.assertEqual(mock_read_frame.call_count, 3)
+
+        view_path = 'optimization_calculation_plots.base_view.OptimizationCalculationBasedPlotView'
+        call_command('plot_snapshots', '2048', view=[view_path], stdout=StringIO())
+        self.assertEqual(PlotSnapshot.objects.filter(calculation_id=2048).count(), len(LAYOUTS),
+                         'snapshots of superseded configurations and data are deleted')
+        call_command('plot_snapshots', '2048', delete=True, stdout=StringIO())
+        self.assertFalse(PlotSnapshot.objects.exists())
+
+    def test_migrations_cover_models(self):
+        call_command('makemigrations', 'optimization_calculation_plots', check=True, dry_run=True, stdout=StringIO())
+
+    def test_chunked_groups(self):
+        configuration = OptimizationConfiguration.objects.create(name='chunked')
+        date_range = pd.date_range(start=parse_datetime(self.time_frame[0]), periods=7, freq=self.TIME_FREQUENCE)
+        for end_time in date_range[-3:]:
+            for start_time in date_range:
+                OptimizationCalculation.objects.create(optimization_configuration=configuration,
+                                                       start_time=start_time, end_time=end_time)
+        calculation = Mock(start_time=date_range[0], end_time=date_range[-1], optimization_configuration=configuration)
+        context = PlotContext.for_calculation(calculation)
+        plot_config = PlotConfig(OptimizationCalculation, {}, ['start_time__range', PlotConfig.opt_calc_filter_range],
+                                 index=['end_time', 'start_time'], values=['id'], loader='values_list')
+        expected = [(end_time, frame.droplevel(0)) for end_time, frame in plot_config.get_df(context).groupby(level=0)]
+
+        for chunk_memory in (1, 200, 10 ** 6):
+            plot_config.chunk_memory = chunk_memory
+            groups = list(plot_config.iter_group_frames(context))
+
+            self.assertEqual([end_time for end_time, _ in groups], [end_time for end_time, _ in expected])
+            for (_, frame), (_, expected_frame) in zip(groups, expected):
+                pd.testing.assert_frame_equal(frame, expected_frame)
+
+        view = OptimizationCalculationBasedPlotView()
+        view.request = view.initialize_request(APIRequestFactory().get(''))
+        view.plot_context = context
+        series = list(view.iter_plot_series(plot_config))
+        plot_config.chunk_memory = None
+
+        self.assertEqual([label for _, label in series], [label for _, label in view.iter_plot_series(plot_config)])
+        for (data, _), (expected_data, _) in zip(series, view.iter_plot_series(plot_config)):
+            pd.testing.assert_series_equal(data, expected_data)
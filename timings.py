@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Wall time, row and point counts of plot pipeline stages of one request
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageRecord:
+    """ stage - query, transform, group, serialize; plot - name of PlotConfig or None for whole request """
+    __slots__ = ('stage', 'plot', 'duration', 'rows', 'points')
+
+    def __init__(self, stage, plot=None):
+        self.stage = stage
+        self.plot = plot
+        self.duration = 0.0
+        self.rows = 0
+        self.points = 0
+
+    def as_dict(self):
+        return {'stage': self.stage, 'plot': self.plot, 'duration': self.duration, 'rows': self.rows,
+                'points': self.points}
+
+
+class PlotTimings:
+    """
+    Records of stages measured by stage context manager, threads building plots concurrently share it
+    """
+
+    def __init__(self):
+        self.records = []
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, plot=None):
+        record = StageRecord(name, plot.name if plot is not None else None)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.duration = time.perf_counter() - start
+            with self._lock:
+                self.records.append(record)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def durations(self):
+        """ map stage -> sum of durations of its records, in order of first record """
+        durations = {}
+        for record in list(self.records):
+            durations[record.stage] = durations.get(record.stage, 0.0) + record.duration
+        return durations
+
+    def server_timing(self):
+        """ value of Server-Timing header, durations in milliseconds """
+        metrics = list(self.durations().items()) + [('total', self.total)]
+        return ', '.join('{};dur={:.3f}'.format(stage, duration * 1000) for stage, duration in metrics)
+
+    def __bool__(self):
+        return True
+
+
+class NullPlotTimings:
+    """ PlotTimings recording nothing, used when instrumentation is off """
+    records = ()
+    total = 0.0
+
+    def __init__(self):
+        self._record = StageRecord(None)
+        self._stage = _NullStage(self._record)
+
+    def stage(self, name, plot=None):
+        return self._stage
+
+    def durations(self):
+        return {}
+
+    def server_timing(self):
+        return ''
+
+    def __bool__(self):
+        return False
+
+
+class _NullStage:
+    __slots__ = ('record',)
+
+    def __init__(self, record):
+        self.record = record
+
+    def __enter__(self):
+        return self.record
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMINGS = NullPlotTimings()
@@ -4,7 +4,8 @@ from rest_framework.generics import ListAPIView
 from collections import namedtuple
 from django.http import HttpResponseNotFound, HttpResponseServerError
 
-from .models import OptimizationCalculation, OptimizationConfiguration
+from .base_configuration import PlotContext
+from .models import OptimizationCalculation
 from .serializers import PlotDataSerializer
 import logging
 
@@ -20,21 +21,20 @@ class OptimizationCalculationBasedPlotView(ListAPIView):
 
     def __init__(self, *args, **kwargs):
         self.optimization_calculation = -1
+        self.plot_context = None
         self._pandas_list = PandasList()
         super().__init__(*args, **kwargs)
 
     def get(self, request, *args, **kwargs):
         try:
             calculation_id = kwargs.pop('calculation_id')
-            self.optimization_calculation = OptimizationCalculation.objects.get(id=calculation_id)
+            self.optimization_calculation = OptimizationCalculation.objects.select_related(
+                'optimization_configuration').get(id=calculation_id)
         except KeyError:
             return HttpResponseServerError('No calculation ID given')
         except OptimizationCalculation.DoesNotExist:
             return HttpResponseNotFound('Optimization Calculation with ID {} not found'.format(calculation_id))
-        if self.plots_configs:
-            opt_calc = OptimizationCalculation.objects.get(id=calculation_id)
-            opt_conf = OptimizationConfiguration.objects.get(id=opt_calc.optimization_configuration_id)
-            self.plots_configs[0].set_optimization_calc_conf(opt_calc, opt_conf)
+        self.plot_context = PlotContext.for_calculation(self.optimization_calculation)
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
@@ -44,7 +44,7 @@ class OptimizationCalculationBasedPlotView(ListAPIView):
         return pd_list
 
     def add_plot_by_source_to_pandas_list(self, plot, pd_list):
-        df = plot.df
+        df = plot.get_df(self.plot_context)
         if not self._is_df_multiindex(df):
             pd_list.add_ds(df.loc[:, plot.values[0]], plot.name)
             return